@@ -0,0 +1,227 @@
+"""
+Один упакованный файл со всеми ресурсами.
+
+Формат (little-endian):
+    заголовок   magic "FRPK", версия u16, число записей u32
+    индекс      для каждой записи: длина имени u16, имя utf-8,
+                смещение u64, длина u64, sha1 (20 байт)
+    данные      содержимое файлов подряд, каждое выровнено на ALIGN
+
+Пак открывается через mmap, open() отдает файлоподобный объект поверх
+среза memoryview, так что декодер читает прямо из отображенной памяти.
+Модуль не зависит от arcade, им пользуется и симуляция без окна.
+
+    python assetpack.py build [-o assets.pak]   # упаковать ресурсы
+    python assetpack.py list [assets.pak]       # содержимое пака
+"""
+import argparse
+import glob
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+PACK_PATH = os.path.join(ASSET_DIR, "assets.pak")
+
+MAGIC = b"FRPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+NAME_LEN = struct.Struct("<H")
+ENTRY = struct.Struct("<QQ20s")
+ALIGN = 16
+
+# Что попадает в пак при сборке
+PACK_PATTERNS = ["*.png", "*.wav", "frogg/*.png", "baked/*"]
+
+
+class MemoryReader(io.RawIOBase):
+    """Файл только для чтения поверх memoryview, без копирования всего среза"""
+
+    def __init__(self, view):
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = len(self.view) + offset
+        return self.pos
+
+    def readinto(self, buffer):
+        chunk = self.view[self.pos:self.pos + len(buffer)]
+        n = len(chunk)
+        buffer[:n] = chunk
+        self.pos += n
+        return n
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self.view) - self.pos
+        chunk = bytes(self.view[self.pos:self.pos + size])
+        self.pos += len(chunk)
+        return chunk
+
+
+class AssetPack:
+    def __init__(self, path=PACK_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        # имя -> (смещение, длина, sha1)
+        self.index = {}
+
+        magic, version, count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: не пак ресурсов или другая версия")
+        offset = HEADER.size
+        for _ in range(count):
+            (length,) = NAME_LEN.unpack_from(self.mm, offset)
+            offset += NAME_LEN.size
+            name = self.mm[offset:offset + length].decode("utf-8")
+            offset += length
+            self.index[name] = ENTRY.unpack_from(self.mm, offset)
+            offset += ENTRY.size
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def data(self, name):
+        """memoryview с содержимым ресурса, без копирования"""
+        offset, length, _ = self.index[name]
+        return self.view[offset:offset + length]
+
+    def open(self, name):
+        return MemoryReader(self.data(name))
+
+    def content_hash(self, name):
+        return self.index[name][2].hex()
+
+    def close(self):
+        self.view.release()
+        self.mm.close()
+        self.file.close()
+
+
+def build_pack(names, out_path=PACK_PATH, base_dir=ASSET_DIR):
+    blobs = []
+    for name in names:
+        with open(os.path.join(base_dir, name), "rb") as f:
+            blobs.append((name, f.read()))
+
+    index_size = sum(NAME_LEN.size + len(n.encode("utf-8")) + ENTRY.size for n, _ in blobs)
+    offset = HEADER.size + index_size
+    entries = []
+    for name, data in blobs:
+        offset += -offset % ALIGN
+        entries.append((name, offset, data))
+        offset += len(data)
+
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for name, offset, data in entries:
+            encoded = name.encode("utf-8")
+            f.write(NAME_LEN.pack(len(encoded)))
+            f.write(encoded)
+            f.write(ENTRY.pack(offset, len(data), hashlib.sha1(data).digest()))
+        for name, offset, data in entries:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, out_path)
+    return len(entries)
+
+
+def collect_names(base_dir=ASSET_DIR, patterns=PACK_PATTERNS):
+    names = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(base_dir, pattern)):
+            if os.path.isfile(path):
+                names.add(os.path.relpath(path, base_dir).replace(os.sep, "/"))
+    return sorted(names)
+
+
+_pack = None
+_pack_checked = False
+
+
+def default_pack():
+    """assets.pak рядом с игрой, если он собран"""
+    global _pack, _pack_checked
+    if not _pack_checked:
+        _pack_checked = True
+        if os.path.isfile(PACK_PATH):
+            _pack = AssetPack(PACK_PATH)
+    return _pack
+
+
+def asset_path(name):
+    """Путь к ресурсу на диске, не зависящий от текущей папки"""
+    return os.path.join(ASSET_DIR, name)
+
+
+def open_asset(name):
+    """Открывает ресурс из пака, а если его там нет - с диска"""
+    pack = default_pack()
+    if pack is not None and name in pack:
+        return pack.open(name)
+    return open(asset_path(name), "rb")
+
+
+def has_asset(name):
+    pack = default_pack()
+    return (pack is not None and name in pack) or os.path.isfile(asset_path(name))
+
+
+def asset_stamp(name):
+    """Строка, которая меняется вместе с содержимым ресурса"""
+    pack = default_pack()
+    if pack is not None and name in pack:
+        return pack.content_hash(name)
+    try:
+        st = os.stat(asset_path(name))
+    except OSError:
+        return "missing"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пак ресурсов")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="упаковать ресурсы")
+    build.add_argument("-o", "--out", default=PACK_PATH)
+    show = sub.add_parser("list", help="показать содержимое")
+    show.add_argument("pack", nargs="?", default=PACK_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_pack(collect_names(), args.out)
+        print(f"Упаковано файлов: {count}, {os.path.getsize(args.out) // 1024} КБ")
+    else:
+        pack = AssetPack(args.pack)
+        for name, (offset, length, digest) in pack.index.items():
+            print(f"{offset:>10} {length:>10} {digest.hex()[:12]} {name}")
+        pack.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Общий на весь процесс кэш ресурсов.
+
+Текстуры (с уже посчитанными хитбоксами), отраженные кадры и звуки
+загружаются один раз и переживают перезапуск уровня и создание новых
+View. Кэш вытесняет давно не использованные ресурсы, когда их суммарный
+размер превышает бюджет.
+
+prefetch() заранее декодирует картинки и считает хитбоксы в фоновом
+потоке; в основном потоке остается только создать из готового Texture.
+
+Хитбоксы берутся из дискового кэша hitboxes.py, так что контур картинки
+обходится только при первом запуске после ее изменения; у отраженных
+кадров хитбокс - отражение исходного. texture(path, hit_box=False) не
+обходит контур вовсе: для картинок, по хитбоксу которых ничего не
+считается (карточки игры на память).
+
+Если собраны атласы (python build_assets.py), картинки берутся из них
+уже уменьшенными. Тогда texture_scale(path) - масштаб, с которым картинка
+запечена, и спрайтам нужен масштаб scale / texture_scale(path); sprite()
+и geometry() учитывают это сами.
+
+Все файлы открываются через assetpack.open_asset: из assets.pak, если он
+собран, иначе с диска рядом с игрой, независимо от текущей папки.
+"""
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import arcade
+import pyglet
+from PIL import Image
+
+import hitboxes
+from assetpack import asset_stamp, has_asset, open_asset
+
+
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+BAKED_DIR = "baked"
+MANIFEST_VERSION = 1
+
+
+def load_manifest(baked_dir):
+    try:
+        with open_asset(f"{baked_dir}/manifest.json") as f:
+            manifest = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+class PackedSound(arcade.Sound):
+    """arcade.Sound, данные которого читаются из открытого файла, а не по пути"""
+
+    def __init__(self, name, file):
+        self.file_name = name
+        self.source = pyglet.media.load(name, file=file, streaming=False)
+        if self.source.duration is None:
+            raise ValueError(f"Не удалось узнать длительность {name}")
+        self.min_distance = 100000000
+
+
+def decode_image(path, hit_box=True):
+    """Тяжелая часть загрузки текстуры, безопасна для фонового потока"""
+    # Из пака картинка читается прямо из mmap, без копии в bytes
+    with open_asset(path) as f:
+        image = Image.open(f)
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        image.load()
+    if not hit_box:
+        return image, hitboxes.rectangle(image)
+    # Файл не читается второй раз ради хэша: хватает отметки из индекса пака
+    # или размера и времени изменения файла на диске
+    source = hitboxes.content_hash(f"{path}={asset_stamp(path)}".encode())
+    return image, hitboxes.calculate(image, source)
+
+
+class AssetManager:
+    def __init__(self, budget=MEMORY_BUDGET, baked_dir=BAKED_DIR):
+        self.baked_dir = baked_dir
+        self.manifest = load_manifest(baked_dir)
+        self.baked = self.manifest["assets"] if self.manifest else {}
+        # номер страницы атласа -> картинка; читается и из фонового потока
+        self.pages = {}
+        self.pages_lock = threading.Lock()
+        self.budget = budget
+        self.used = 0
+        # ключ -> (ресурс, размер в байтах)
+        self.entries = OrderedDict()
+        # (путь, масштаб) -> (хитбокс, размер), это копейки, не вытесняем
+        self.geometries = {}
+        # путь -> Future с результатом decode_image
+        self.pending = {}
+        self.executor = None
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, value, cost):
+        self.entries[key] = (value, cost)
+        self.used += cost
+        while self.used > self.budget and len(self.entries) > 1:
+            _, (_, old_cost) = self.entries.popitem(last=False)
+            self.used -= old_cost
+        return value
+
+    @property
+    def geometry_tag(self):
+        """Меняется вместе с набором атласов: от него зависят хитбоксы"""
+        if not self.manifest:
+            return ""
+        return "baked:" + asset_stamp(f"{self.baked_dir}/manifest.json")
+
+    def texture_scale(self, path):
+        entry = self.baked.get(path)
+        return entry["scale"] if entry else 1.0
+
+    def _page(self, index):
+        with self.pages_lock:
+            page = self.pages.get(index)
+            if page is None:
+                name = self.manifest["pages"][index]
+                page = Image.open(open_asset(f"{self.baked_dir}/{name}")).convert("RGBA")
+                self.pages[index] = page
+            return page
+
+    def _decode(self, name, hit_box=True):
+        entry = self.baked.get(name)
+        if entry is None:
+            return decode_image(name, hit_box)
+        x, y = entry["x"], entry["y"]
+        image = self._page(entry["page"]).crop((x, y, x + entry["w"], y + entry["h"]))
+        if not hit_box:
+            return image, hitboxes.rectangle(image)
+        # Запеченная картинка меняется вместе с манифестом
+        source = hitboxes.content_hash(f"{self.geometry_tag}:{name}".encode())
+        return image, hitboxes.calculate(image, source, entry["scale"])
+
+    def _load(self, name, hash, hit_box=True):
+        # prefetch() считает обведенный хитбокс; запрос без хитбокса его не берет,
+        # и результат дождется обычного texture(name)
+        future = self.pending.pop(name, None) if hit_box else None
+        if future is not None:
+            image, points = future.result()
+        else:
+            image, points = self._decode(name, hit_box)
+        return arcade.Texture(image, hit_box_points=points, hash=hash)
+
+    def texture(self, path, hit_box=True):
+        key = ("texture", path) if hit_box else ("texture", path, "rectangle")
+        texture = self._get(key)
+        if texture is None:
+            texture = self._load(path, path, hit_box)
+            texture = self._put(key, texture, texture.width * texture.height * 4)
+        return texture
+
+    def prefetch(self, paths):
+        """Начинает декодировать текстуры в фоне, не дожидаясь результата"""
+        for path in paths:
+            if ("texture", path) in self.entries or path in self.pending:
+                continue
+            if path not in self.baked and not has_asset(path):
+                continue
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="asset-prefetch")
+            self.pending[path] = self.executor.submit(self._decode, path)
+
+    def flipped_texture(self, path):
+        """Текстура, отраженная по горизонтали"""
+        key = ("flipped", path)
+        name = f"{path}|flipped"
+        texture = self._get(key)
+        if texture is None:
+            if name in self.baked:
+                texture = self._load(name, name)
+            else:
+                source = self.texture(path)
+                image = source.image.transpose(Image.FLIP_LEFT_RIGHT)
+                texture = arcade.Texture(image, hash=name,
+                                         hit_box_points=hitboxes.mirrored(source.hit_box_points))
+            texture = self._put(key, texture, texture.width * texture.height * 4)
+        return texture
+
+    def sound(self, path):
+        key = ("sound", path)
+        sound = self._get(key)
+        if sound is None:
+            try:
+                file = open_asset(path)
+            except OSError as e:
+                raise FileNotFoundError(f"Не удалось загрузить звук {path}") from e
+            with file:
+                sound = PackedSound(path, file)
+            audio = sound.source.audio_format
+            cost = int(sound.source.duration * audio.bytes_per_second) if audio else 0
+            sound = self._put(key, sound, cost)
+        return sound
+
+    def geometry(self, path, scale):
+        """Хитбокс (left, bottom, right, top от центра) и размер спрайта"""
+        key = (path, scale)
+        geometry = self.geometries.get(key)
+        if geometry is None:
+            texture = self.texture(path)
+            factor = scale / self.texture_scale(path)
+            xs = [x * factor for x, _ in texture.hit_box_points]
+            ys = [y * factor for _, y in texture.hit_box_points]
+            geometry = ((min(xs), min(ys), max(xs), max(ys)),
+                        (texture.width * factor, texture.height * factor))
+            self.geometries[key] = geometry
+        return geometry
+
+    def sprite(self, path, scale=1.0, **kwargs):
+        return arcade.Sprite(self.texture(path), scale=scale / self.texture_scale(path),
+                             **kwargs)
+
+    def clear(self):
+        self.pending.clear()
+        with self.pages_lock:
+            self.pages.clear()
+        self.entries.clear()
+        self.geometries.clear()
+        self.used = 0
+
+
+assets = AssetManager()
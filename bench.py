@@ -0,0 +1,318 @@
+"""
+Замеры скорости.
+
+    python bench.py run [-o results.json] [-k фильтр]   # прогнать замеры
+    python bench.py compare old.json new.json [--threshold 0.1]
+
+run печатает таблицу и сохраняет JSON с медианой и минимумом времени на
+вызов и описанием машины. compare сравнивает медианы и выходит с кодом 1,
+если какой-то замер стал медленнее больше чем на threshold (доля).
+
+Замеры, которым нужно окно arcade (сборка уровня, загрузка кадров лягушки,
+MemoryGameView, on_update), запускаются в безголовом режиме; если окно
+создать не удалось, они помечаются как пропущенные.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from assetpack import ASSET_DIR
+from levels import LEVEL_NUMBERS
+from simulation import Body, World
+from spatial import SpatialGrid
+
+
+HIT_COUNTS = [100, 1000, 10000]
+MEMORY_GRIDS = [(4, 3), (10, 10), (40, 40)]
+FROG_FRAMES = [f"frogg/frog{i}.png" for i in range(1, 10)]
+
+# (ширина, высота) тел в замере hits
+WALL_SIZE = (128, 64)
+COIN_SIZE = (32, 32)
+# Тела раскладываются полосой, длина которой растет вместе с числом тел
+HIT_STRIP_HEIGHT = 2000
+HIT_DENSITY = 1 / (256 * 256)
+
+
+def measure(fn, repeat=5, number=1, setup=None):
+    """Время одного вызова fn: медиана и минимум по repeat прогонам"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {"median": statistics.median(times), "min": min(times),
+            "repeat": repeat, "number": number}
+
+
+def machine_info():
+    info = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        info["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ASSET_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    for module in ("arcade", "pyglet", "PIL"):
+        try:
+            info[module] = __import__(module).__version__
+        except (ImportError, AttributeError):
+            pass
+    return info
+
+
+# Замеры без окна
+def bench_hits(results):
+    world = World()
+    for kind, size in (("walls", WALL_SIZE), ("coins", COIN_SIZE)):
+        w, h = size
+        box = (-w / 2, -h / 2, w / 2, h / 2)
+        for count in HIT_COUNTS:
+            rng = random.Random(count)
+            length = count / (HIT_DENSITY * HIT_STRIP_HEIGHT)
+            bodies = [Body(None, 1, rng.uniform(0, length), rng.uniform(0, HIT_STRIP_HEIGHT),
+                           box, size) for _ in range(count)]
+            grid = SpatialGrid(items=bodies)
+            player = Body(None, 1, 0, 0, (-30, -40, 30, 40), (60, 80))
+            probes = [(rng.uniform(0, length), rng.uniform(0, HIT_STRIP_HEIGHT))
+                      for _ in range(1000)]
+
+            def run():
+                for player.center_x, player.center_y in probes:
+                    world.hits(player, grid)
+
+            result = measure(run)
+            # на один вызов hits
+            for key in ("median", "min"):
+                result[key] /= len(probes)
+            results[f"hits.{kind}.{count}"] = result
+
+
+def bench_world_step(results):
+    world = World()
+    world.press("right")
+    results["world.step"] = measure(world.step, number=2000)
+
+
+def bench_respawn(results):
+    world = World()
+
+    def run():
+        world.respawn(world.level)
+        world.events.clear()
+
+    results["world.respawn"] = measure(run, number=1000)
+
+
+def bench_savegame(results):
+    import savegame
+
+    world = World()
+    world.press("right")
+    for _ in range(120):
+        world.step()
+    data = savegame.snapshot(world)
+    results["savegame.snapshot"] = measure(lambda: savegame.snapshot(world), number=1000)
+    results["savegame.restore"] = measure(lambda: savegame.restore(world, data), number=1000)
+
+
+def bench_rewind(results):
+    from rewind import RewindBuffer
+
+    world = World()
+    world.press("right")
+    buffer = RewindBuffer()
+    results["rewind.record"] = measure(lambda: buffer.record(world), number=1000)
+    for _ in range(600):
+        world.step()
+        buffer.record(world)
+    results["rewind.step_back"] = measure(lambda: buffer.step_back(world), number=100)
+
+
+def bench_leaderboard(results):
+    import tempfile
+    from leaderboard import BATCH_SIZE, Leaderboard
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        board = Leaderboard(os.path.join(tmp, "leaderboard.db"))
+        board.add([("frog", 0, "bench", rng.uniform(20, 400)) for _ in range(100_000)])
+        results["leaderboard.board_100k"] = measure(lambda: board.board("frog", 0),
+                                                    setup=board.boards.clear)
+        results["leaderboard.rank"] = measure(lambda: board.rank("frog", 0, 123.4), number=1000)
+        page = board.top("frog", 0, 10)
+        results["leaderboard.top_page"] = measure(
+            lambda: board.top("frog", 0, 10, after=page[-1]), number=1000)
+        batch = [("frog", 0, "bench", rng.uniform(20, 400)) for _ in range(BATCH_SIZE)]
+        results["leaderboard.add_batch"] = measure(lambda: board.add(batch), number=10)
+        board.close()
+
+
+# Замеры с окном
+def open_window():
+    if not os.environ.get("DISPLAY"):
+        os.environ.setdefault("ARCADE_HEADLESS", "1")
+    try:
+        import arcade
+        return arcade.Window(1280, 720, "bench", visible=False)
+    except Exception as e:
+        print(f"Окно arcade недоступно, такие замеры пропущены: {e}", file=sys.stderr)
+        return None
+
+
+def bench_build_level(results, window):
+    from game2 import GameView
+
+    view = GameView()
+    for number in LEVEL_NUMBERS:
+        view.world.load_level(number)
+        view.world.events.clear()
+        results[f"build_level.{number}"] = measure(view.build_level, repeat=7)
+
+
+def bench_frog_frames(results, window):
+    from assets import AssetManager
+
+    manager = None
+
+    def setup():
+        nonlocal manager
+        # Каждый прогон с пустым кэшем
+        manager = AssetManager()
+
+    def run():
+        for frame in FROG_FRAMES:
+            manager.texture(frame)
+            manager.flipped_texture(frame)
+
+    results["assets.frog_frames"] = measure(run, setup=setup)
+
+
+def bench_memory_setup(results, window):
+    from memory_game import MemoryGameView
+
+    for rows, cols in MEMORY_GRIDS:
+        view = MemoryGameView(rows, cols)
+        results[f"memory.setup.{rows}x{cols}"] = measure(view.setup)
+
+
+def bench_on_update(results, window):
+    import arcade
+    from game2 import GameView
+    from simulation import SIMULATION_STEP
+
+    view = GameView()
+    view.setup()
+    window.show_view(view)
+    view.on_key_press(arcade.key.RIGHT, 0)
+    results["game.on_update"] = measure(lambda: view.on_update(SIMULATION_STEP), number=600)
+
+
+HEADLESS_BENCHES = [bench_hits, bench_world_step, bench_respawn, bench_savegame,
+                    bench_rewind, bench_leaderboard]
+WINDOW_BENCHES = [bench_build_level, bench_frog_frames, bench_memory_setup, bench_on_update]
+
+
+def run(pattern=None):
+    results = {}
+    skipped = []
+    selected = [b for b in HEADLESS_BENCHES + WINDOW_BENCHES
+                if not pattern or pattern in b.__name__]
+    window = None
+    if any(b in WINDOW_BENCHES for b in selected):
+        window = open_window()
+    for bench in selected:
+        if bench in WINDOW_BENCHES:
+            if window is None:
+                skipped.append(bench.__name__)
+                continue
+            bench(results, window)
+        else:
+            bench(results)
+    if window is not None:
+        window.close()
+    return {"machine": machine_info(), "results": results, "skipped": skipped}
+
+
+def print_results(results):
+    for name, result in results.items():
+        line = f"{name:<28} {result['median'] * 1e6:>12.1f} мкс  (мин {result['min'] * 1e6:.1f})"
+        if name in ("game.on_update", "world.step"):
+            line += f"  {1 / result['median']:.0f} тиков/с"
+        print(line)
+
+
+def compare(old, new, threshold):
+    """Список замеров, ставших медленнее больше чем на threshold"""
+    regressions = []
+    for name, result in new["results"].items():
+        base = old["results"].get(name)
+        if base is None:
+            print(f"{name:<28} новый")
+            continue
+        change = result["median"] / base["median"] - 1
+        mark = ""
+        if change > threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions.append(name)
+        print(f"{name:<28} {base['median'] * 1e6:>12.1f} -> {result['median'] * 1e6:>12.1f} мкс"
+              f"  {change:+.1%}{mark}")
+    for name in old["results"]:
+        if name not in new["results"]:
+            print(f"{name:<28} нет в новом прогоне")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры скорости")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="прогнать замеры")
+    run_parser.add_argument("-o", "--out", help="куда сохранить JSON")
+    run_parser.add_argument("-k", dest="pattern", help="только замеры с этой подстрокой в имени")
+    compare_parser = sub.add_parser("compare", help="сравнить два прогона")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="допустимое замедление, доля (по умолчанию 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args.pattern)
+        print_results(report["results"])
+        if report["skipped"]:
+            print("Пропущены:", ", ".join(report["skipped"]))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=1)
+        return 0
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+        print(f"Медленнее больше чем на {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
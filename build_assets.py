@@ -0,0 +1,177 @@
+"""
+Сборка запеченных ресурсов.
+
+Каждая картинка уменьшается до того размера, в котором ее реально рисуют
+(берется наибольший масштаб из уровней и констант игр), для лягушки
+заранее отражаются кадры влево, и всё раскладывается по атласам
+baked/atlas{n}.png. В baked/manifest.json записано, где лежит каждая
+картинка и с каким масштабом она запечена. assets.AssetManager подхватывает
+манифест сам, если он есть.
+
+    python build_assets.py            # собрать
+    python build_assets.py --clean    # удалить baked/
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+
+from PIL import Image
+
+from game2 import COIN_ICON_SCALING
+from levels import ASSET_DIR, LEVEL_NUMBERS, PLAYER_SCALING, level_path, read_spec
+from memory_game import BACK_IMAGE, CARD_SCALE, CARD_TYPES
+
+BAKED_DIR = os.path.join(ASSET_DIR, "baked")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+ATLAS_SIZE = 2048
+PADDING = 2
+
+FROG_FRAMES = [f"frogg/frog{i}.png" for i in range(1, 10)]
+
+# Картинки вне уровней: путь -> масштаб, в котором их рисуют
+EXTRA_USES = {
+    **{f"card{i}.png": CARD_SCALE for i in range(1, CARD_TYPES + 1)},
+    BACK_IMAGE: CARD_SCALE,
+}
+
+# Картинки, которые вместе подменяют друг друга на одном спрайте,
+# должны быть запечены в одном масштабе
+SHARED_SCALE_GROUPS = [FROG_FRAMES]
+
+
+def collect_uses():
+    """путь -> наибольший масштаб, в котором его рисуют"""
+    uses = dict(EXTRA_USES)
+
+    def use(path, scale):
+        uses[path] = max(uses.get(path, 0), scale)
+
+    for number in LEVEL_NUMBERS:
+        spec, _ = read_spec(level_path(number))
+        for item in spec["walls"] + spec.get("lava", []) + spec.get("tiles", []):
+            use(item["texture"], item["scale"])
+        coins = spec.get("coins")
+        if coins:
+            use(coins["texture"], coins["scale"])
+            use(coins["texture"], COIN_ICON_SCALING)
+        portal = spec["portal"]
+        use(portal["texture"], portal["scale"])
+        use(portal["active_texture"], portal["scale"])
+        enemies = spec.get("enemies")
+        if enemies:
+            use(enemies["texture"], enemies["scale"])
+        if spec.get("background"):
+            # фон растягивается на весь экран
+            use(spec["background"], 1.0)
+
+    for path in FROG_FRAMES:
+        use(path, PLAYER_SCALING)
+    for group in SHARED_SCALE_GROUPS:
+        scale = max(uses.get(path, 0) for path in group)
+        for path in group:
+            uses[path] = scale
+
+    return {path: min(scale, 1.0) for path, scale in uses.items()
+            if os.path.isfile(os.path.join(ASSET_DIR, path))}
+
+
+def bake_images(uses):
+    """имя в манифесте -> (картинка, масштаб)"""
+    baked = {}
+    for path, scale in sorted(uses.items()):
+        with Image.open(os.path.join(ASSET_DIR, path)) as source:
+            image = source.convert("RGBA")
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        baked[path] = (image, scale)
+        if path in FROG_FRAMES:
+            baked[f"{path}|flipped"] = (image.transpose(Image.FLIP_LEFT_RIGHT), scale)
+    return baked
+
+
+def pack(baked):
+    """
+    Раскладка полками: картинки по убыванию высоты, слева направо,
+    новая полка - когда не помещается по ширине, новая страница - по высоте.
+    """
+    pages = []
+    placements = {}
+    page = x = y = shelf = 0
+    order = sorted(baked, key=lambda name: baked[name][0].height, reverse=True)
+    for name in order:
+        image = baked[name][0]
+        w, h = image.width + PADDING, image.height + PADDING
+        if w > ATLAS_SIZE or h > ATLAS_SIZE:
+            raise ValueError(f"{name} не помещается в атлас {ATLAS_SIZE}x{ATLAS_SIZE}")
+        if x + w > ATLAS_SIZE:
+            x, y, shelf = 0, y + shelf, 0
+        if y + h > ATLAS_SIZE:
+            page, x, y, shelf = page + 1, 0, 0, 0
+        if page == len(pages):
+            pages.append(Image.new("RGBA", (ATLAS_SIZE, ATLAS_SIZE), (0, 0, 0, 0)))
+        pages[page].paste(image, (x, y))
+        placements[name] = (page, x, y, image.width, image.height)
+        x += w
+        shelf = max(shelf, h)
+    return pages, placements
+
+
+def build(out_dir=BAKED_DIR):
+    uses = collect_uses()
+    baked = bake_images(uses)
+    pages, placements = pack(baked)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(out_dir, "atlas*.png")):
+        os.remove(old)
+    page_names = []
+    for i, image in enumerate(pages):
+        # Обрезаем пустой низ последней страницы
+        bbox = image.getbbox()
+        if bbox:
+            image = image.crop((0, 0, ATLAS_SIZE, bbox[3]))
+        name = f"atlas{i}.png"
+        image.save(os.path.join(out_dir, name), optimize=True)
+        page_names.append(name)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "pages": page_names,
+        "assets": {
+            name: {"page": page, "x": x, "y": y, "w": w, "h": h,
+                   "scale": baked[name][1]}
+            for name, (page, x, y, w, h) in sorted(placements.items())
+        },
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка атласов ресурсов")
+    parser.add_argument("--out", default=BAKED_DIR)
+    parser.add_argument("--clean", action="store_true", help="удалить собранные атласы")
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        shutil.rmtree(args.out, ignore_errors=True)
+        return 0
+
+    manifest = build(args.out)
+    before = sum(os.path.getsize(os.path.join(ASSET_DIR, p))
+                 for p in manifest["assets"] if "|" not in p)
+    after = sum(os.path.getsize(os.path.join(args.out, p)) for p in manifest["pages"])
+    print(f"Картинок: {len(manifest['assets'])}, страниц: {len(manifest['pages'])}, "
+          f"{before // 1024} КБ -> {after // 1024} КБ")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Отладочный слой платформера: сетка координат (E), хитбоксы (Q)
+и график профайлера (P).
+
+Линии сетки собираются в ShapeElementList один раз на ячейку сетки, в
+которой стоит камера, и дальше только рисуются. Подписи - пул arcade.Text
+в одном batch: надпись раскладывается заново, только если поменялся ее
+текст. Хитбоксы всех видимых спрайтов одного цвета уходят одним
+draw_lines, спрайты вне камеры сюда не передаются вовсе. Невидимые
+коллайдеры из карт Tiled рисуются рамками по самим телам.
+
+ProfilerOverlay рисует время последних кадров столбиками и перцентили;
+текст обновляется раз в PROFILER_TEXT_REFRESH кадров.
+"""
+import arcade
+import pyglet
+from arcade.shape_list import ShapeElementList, create_lines
+
+from hud import Hud
+
+
+GRID_COLOR = arcade.color.LIGHT_GRAY
+LABEL_COLOR = arcade.color.YELLOW
+POINT_COLOR = arcade.color.RED
+GRID_LABEL_SIZE = 10
+POSITION_LABEL_SIZE = 12
+HIT_BOX_WIDTH = 2
+
+PROFILER_BACKGROUND = (0, 0, 0, 170)
+PROFILER_BAR_COLOR = arcade.color.LIGHT_GREEN
+PROFILER_BUDGET_COLOR = arcade.color.RED
+# Пикселей на миллисекунду по высоте и на кадр по ширине
+PROFILER_MS_HEIGHT = 3
+PROFILER_BAR_WIDTH = 2
+PROFILER_PHASE_LINES = 8
+PROFILER_TEXT_REFRESH = 15
+FRAME_BUDGET_MS = 1000 / 60
+
+
+class DebugOverlay:
+    def __init__(self, width, height, spacing):
+        self.width = width
+        self.height = height
+        self.spacing = spacing
+
+        # Ячейка камеры, для которой собрана сетка
+        self.grid_cell = None
+        self.grid_shapes = None
+        self.grid_xs = self.grid_ys = ()
+
+        self.batch = pyglet.graphics.Batch()
+        self.labels = []
+        self.used = 0
+
+    # Подписи
+    def _label(self, text, x, y, font_size):
+        if self.used == len(self.labels):
+            self.labels.append(arcade.Text(text, x, y, LABEL_COLOR, font_size,
+                                           batch=self.batch))
+        label = self.labels[self.used]
+        self.used += 1
+        label.text = text
+        if label.font_size != font_size:
+            label.font_size = font_size
+        label.position = (x, y)
+        if not label.visible:
+            label.visible = True
+        return label
+
+    def begin(self):
+        """Начало кадра: все подписи из пула снова свободны"""
+        self.used = 0
+
+    def draw_labels(self):
+        for label in self.labels[self.used:]:
+            if label.visible:
+                label.visible = False
+        self.batch.draw()
+
+    # Сетка
+    def _build_grid(self, cell):
+        spacing = self.spacing
+        sx, sy = cell[0] * spacing, cell[1] * spacing
+        # С запасом в клетку: камера может сдвинуться внутри ячейки
+        ex, ey = sx + self.width + spacing, sy + self.height + spacing
+        self.grid_xs = range(sx, ex + 1, spacing)
+        self.grid_ys = range(sy, ey + 1, spacing)
+        points = []
+        for x in self.grid_xs:
+            points += [(x, sy), (x, ey)]
+        for y in self.grid_ys:
+            points += [(sx, y), (ex, y)]
+        self.grid_shapes = ShapeElementList()
+        self.grid_shapes.append(create_lines(points, GRID_COLOR))
+        self.grid_cell = cell
+
+    def draw_grid(self, left, bottom):
+        """Сетка и подписи к ней; left, bottom - угол камеры в мире"""
+        cell = (int(left // self.spacing), int(bottom // self.spacing))
+        if cell != self.grid_cell:
+            self._build_grid(cell)
+        self.grid_shapes.draw()
+
+        right, top = left + self.width, bottom + self.height
+        for x in self.grid_xs:
+            if x <= right:
+                self._label(str(x), x + 2, bottom + 2, GRID_LABEL_SIZE)
+        for y in self.grid_ys:
+            if y <= top:
+                self._label(str(y), left + 2, y + 2, GRID_LABEL_SIZE)
+
+    # Спрайты
+    def draw_positions(self, sprites):
+        """Точка в центре и координаты для каждого спрайта"""
+        points = []
+        for sprite in sprites:
+            x, y = sprite.center_x, sprite.center_y
+            points.append((x, y))
+            self._label(f"{int(x)}, {int(y)}", x + 5, y + 5, POSITION_LABEL_SIZE)
+        if points:
+            arcade.draw_points(points, POINT_COLOR, 5)
+
+    def draw_hit_boxes(self, groups):
+        """groups - пары (спрайты, цвет), по одному draw_lines на цвет"""
+        for sprites, color in groups:
+            points = []
+            for sprite in sprites:
+                box = sprite.hit_box.get_adjusted_points()
+                prev = box[-1]
+                for point in box:
+                    points += (prev, point)
+                    prev = point
+            if points:
+                arcade.draw_lines(points, color, HIT_BOX_WIDTH)
+
+    def draw_bodies(self, groups):
+        """Рамки тел без спрайтов (невидимые коллайдеры), пары (тела, цвет)"""
+        for bodies, color in groups:
+            points = []
+            for body in bodies:
+                l, b, r, t = body.left, body.bottom, body.right, body.top
+                points += ((l, b), (r, b), (r, b), (r, t), (r, t), (l, t), (l, t), (l, b))
+            if points:
+                arcade.draw_lines(points, color, HIT_BOX_WIDTH)
+
+
+class ProfilerOverlay:
+    def __init__(self, profiler, left, bottom, width, height):
+        self.profiler = profiler
+        self.left = left
+        self.bottom = bottom
+        self.width = width
+        self.height = height
+        self.countdown = 0
+
+        self.hud = Hud()
+        top = bottom + height
+        self.hud.add("frame", "Кадр, мс: p50 {:.1f}  p95 {:.1f}  p99 {:.1f}",
+                     left + 6, top - 18, arcade.color.WHITE, 12, 0.0, 0.0, 0.0)
+        for i in range(PROFILER_PHASE_LINES):
+            self.hud.add(f"phase{i}", "{}", left + 6, top - 38 - i * 16,
+                         arcade.color.LIGHT_GRAY, 10, "")
+
+    def refresh_text(self):
+        hud = self.hud
+        hud.set("frame", *(t * 1000 for t in self.profiler.percentiles()))
+        phases = list(self.profiler.phase_averages().items())[:PROFILER_PHASE_LINES]
+        for i in range(PROFILER_PHASE_LINES):
+            if i < len(phases):
+                name, value = phases[i]
+                hud.set(f"phase{i}", f"{name}: {value * 1000:.2f}")
+            else:
+                hud.set(f"phase{i}", "")
+
+    def draw(self):
+        left, bottom = self.left, self.bottom
+        right, top = left + self.width, bottom + self.height
+        arcade.draw_lrbt_rectangle_filled(left, right, bottom, top, PROFILER_BACKGROUND)
+
+        # Столбики времени кадра, самый новый справа
+        count = self.width // PROFILER_BAR_WIDTH
+        times = self.profiler.frame_times()[-count:]
+        x = right - len(times) * PROFILER_BAR_WIDTH
+        points = []
+        for t in times:
+            x += PROFILER_BAR_WIDTH
+            h = min(t * 1000 * PROFILER_MS_HEIGHT, self.height)
+            points += ((x, bottom), (x, bottom + h))
+        if points:
+            arcade.draw_lines(points, PROFILER_BAR_COLOR, PROFILER_BAR_WIDTH)
+        budget = bottom + FRAME_BUDGET_MS * PROFILER_MS_HEIGHT
+        arcade.draw_line(left, budget, right, budget, PROFILER_BUDGET_COLOR, 1)
+
+        if self.countdown <= 0:
+            self.refresh_text()
+            self.countdown = PROFILER_TEXT_REFRESH
+        self.countdown -= 1
+        self.hud.draw()
@@ -1,94 +1,41 @@
+import argparse
 import arcade
-import math
 import os
 import time
-import subprocess
-import sys
-from PIL import Image
+
+import leaderboard
+import levels
+import savegame
+from assetpack import ASSET_DIR, has_asset
+from assets import assets
+from debug import DebugOverlay, ProfilerOverlay
+from hud import Hud
+from profiler import FrameProfiler
+from replay import InputRecorder
+from rewind import RewindBuffer
+from router import go
+from ui import Panel
+from levels import LAST_LEVEL, PLAYER_SCALING, PLAYER_TEXTURE
+from streaming import ChunkStreamer
+from simulation import World, SIMULATION_RATE, SIMULATION_STEP
 
 
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 WINDOW_TITLE = "Frog Adventures 2"
 
-PLAYER_SCALING = 0.20
-PLAYER_SPEED = 5
-PLAYER_JUMP = 15
-PLAYER_DOUBLE_JUMP = 8
-GRAVITY = 0.5
-
-TILE_SCALING = 0.5
-COIN_SCALING = 0.45
-
-INTERACT_DISTANCE = 150
 GRID_SPACING = 64
 
-BREATHING_ANIMATION_SPEED = 0.08
+COIN_ICON_SCALING = 16/32
 
-ENEMY_SCALING = 0.3
-ENEMY_SPEED = 2.5
-ENEMY_BOUNCE_FORCE = 8
+BREATHING_ANIMATION_SPEED = 0.08
 
+# Физика считается фиксированными шагами, отрисовка интерполируется
+MAX_SUBSTEPS = 5
 
+# Куда Shift+P сохраняет записи профайлера
+PROFILE_DIR = os.path.join(ASSET_DIR, "profiles")
 
-class Button:
-    def __init__(self, text, x, y, width, height, color):
-        self.text = text
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.color = color
-        self.is_hovered = False
-        
-    def contains_point(self, x, y):
-        return (self.x - self.width/2 <= x <= self.x + self.width/2 and
-                self.y - self.height/2 <= y <= self.y + self.height/2)
-    
-    def update_hover(self, mouse_x, mouse_y):
-        self.is_hovered = self.contains_point(mouse_x, mouse_y)
-    
-    def draw(self):
-        
-        if self.is_hovered:
-            draw_color = tuple(min(255, c + 50) for c in self.color[:3])
-            border_color = arcade.color.YELLOW
-        else:
-            draw_color = self.color[:3]
-            border_color = arcade.color.WHITE
-        
-        left = self.x - self.width/2
-        right = self.x + self.width/2
-        top = self.y + self.height/2
-        bottom = self.y - self.height/2
-        
-        arcade.draw_triangle_filled(
-            left, bottom,
-            right, bottom,
-            left, top,
-            draw_color
-        )
-        arcade.draw_triangle_filled(
-            right, bottom,
-            right, top,
-            left, top,
-            draw_color
-        )
-        
-        arcade.draw_line(left, top, right, top, border_color, 3)
-        arcade.draw_line(left, bottom, right, bottom, border_color, 3)
-        arcade.draw_line(left, bottom, left, top, border_color, 3)
-        arcade.draw_line(right, bottom, right, top, border_color, 3)
-        
-        arcade.draw_text(
-            self.text,
-            self.x,
-            self.y,
-            arcade.color.WHITE,
-            font_size=16,
-            anchor_x="center",
-            anchor_y="center"
-        )
 
 
 # МЕНЮ ПАУЗЫ
@@ -98,106 +45,139 @@ class PauseMenuView(arcade.View):
         self.game_view = game_view
         
         
-        self.buttons = []
+        self.panel = Panel()
         button_width = 250
         button_height = 60
         button_spacing = 80
         center_x = WINDOW_WIDTH // 2
         start_y = WINDOW_HEIGHT // 2 + 50
         
-        self.buttons.append(Button(
+        self.panel.add_rectangle(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT, (0, 0, 0, 128))
+        
+        self.panel.add_label(
+            "ПАУЗА", 
+            WINDOW_WIDTH // 2, 
+            WINDOW_HEIGHT // 2 + 150, 
+            arcade.color.WHITE, 
+            font_size=48, 
+            anchor_x="center"
+        )
+        
+        self.panel.add_button(
             "Продолжить игру", 
             center_x, 
             start_y, 
             button_width, 
             button_height, 
-            (50, 150, 50, 255)
-        ))
+            (50, 150, 50, 255),
+            self.resume
+        )
         
-        self.buttons.append(Button(
+        # Ждем ли, пока фоновый поток допишет сохранение
+        self.saving = False
+        self.status = self.panel.add_label(
+            "",
+            WINDOW_WIDTH // 2,
+            start_y + 45,
+            arcade.color.LIGHT_GREEN,
+            font_size=16,
+            anchor_x="center"
+        )
+
+        self.panel.add_button(
+            "Сохранить",
+            center_x - button_width // 4 - 5,
+            start_y - button_spacing,
+            button_width // 2 - 10,
+            button_height,
+            (50, 100, 170, 255),
+            self.save_game
+        )
+
+        self.panel.add_button(
+            "Загрузить",
+            center_x + button_width // 4 + 5,
+            start_y - button_spacing,
+            button_width // 2 - 10,
+            button_height,
+            (50, 100, 170, 255),
+            self.load_game
+        )
+
+        self.panel.add_button(
             "Перезапустить", 
             center_x, 
-            start_y - button_spacing, 
+            start_y - button_spacing * 2, 
             button_width, 
             button_height, 
-            (200, 150, 50, 255)
-        ))
+            (200, 150, 50, 255),
+            self.restart
+        )
         
-        self.buttons.append(Button(
+        self.panel.add_button(
             "Главное меню", 
             center_x, 
-            start_y - button_spacing * 2, 
+            start_y - button_spacing * 3, 
             button_width, 
             button_height, 
-            (150, 50, 150, 255)
-        ))
-
-    def on_show_view(self):
-        pass
-
-    def on_draw(self):
-        
-        arcade.draw_triangle_filled(
-            0, 0,
-            WINDOW_WIDTH, 0,
-            0, WINDOW_HEIGHT,
-            (0, 0, 0, 128)
-        )
-        arcade.draw_triangle_filled(
-            WINDOW_WIDTH, 0,
-            WINDOW_WIDTH, WINDOW_HEIGHT,
-            0, WINDOW_HEIGHT,
-            (0, 0, 0, 128)
-        )
-        
-        arcade.draw_text(
-            "ПАУЗА", 
-            WINDOW_WIDTH // 2, 
-            WINDOW_HEIGHT // 2 + 150, 
-            arcade.color.WHITE, 
-            font_size=48, 
-            anchor_x="center"
+            (150, 50, 150, 255),
+            self.return_to_menu
         )
         
-        for button in self.buttons:
-            button.draw()
-        
-        arcade.draw_text(
+        self.panel.add_label(
             "Нажмите ESC для возврата в игру", 
             WINDOW_WIDTH // 2, 
-            WINDOW_HEIGHT // 2 - 200, 
+            WINDOW_HEIGHT // 2 - 250, 
             arcade.color.LIGHT_GRAY, 
             font_size=16, 
             anchor_x="center"
         )
 
+    def on_show_view(self):
+        pass
+
+    def on_draw(self):
+        self.panel.draw()
+
+    def on_update(self, delta_time):
+        # Сохранение пишется в фоне, итог показываем, когда оно на диске
+        if self.saving and not savegame.writer.busy:
+            self.saving = False
+            self.status.text = savegame.writer.error or "Игра сохранена"
+
     def on_mouse_motion(self, x, y, dx, dy):
-        
-        for button in self.buttons:
-            button.update_hover(x, y)
+        self.panel.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        
-        for btn in self.buttons:
-            if btn.contains_point(x, y):
-                if btn.text == "Продолжить игру":
-                    self.window.show_view(self.game_view)
-                elif btn.text == "Перезапустить":
-                    
-                    if hasattr(self.game_view, 'music_player') and self.game_view.music_player:
-                        self.game_view.music_player.pause()
-                        self.game_view.music_player = None
-                
-                    new_game_view = GameView()
-                    self.window.show_view(new_game_view)
-                elif btn.text == "Главное меню":
-                    self.return_to_menu()
-                break
+        self.panel.on_mouse_press(x, y)
 
     def on_key_press(self, key, modifiers):
        
         if key == arcade.key.ESCAPE:
-            self.window.show_view(self.game_view)
+            self.resume()
+
+    def resume(self):
+        self.window.show_view(self.game_view)
+
+    def save_game(self):
+        self.game_view.save_game()
+        self.saving = True
+        self.status.text = "Сохраняем..."
+
+    def load_game(self):
+        error = self.game_view.load_game()
+        if error:
+            self.status.text = error
+        else:
+            self.resume()
+
+    def restart(self):
+        if hasattr(self.game_view, 'music_player') and self.game_view.music_player:
+            self.game_view.music_player.pause()
+            self.game_view.music_player = None
+    
+        new_game_view = GameView()
+        self.window.show_view(new_game_view)
 
     def return_to_menu(self):
         
@@ -205,74 +185,47 @@ class PauseMenuView(arcade.View):
             self.game_view.music_player.pause()
             self.game_view.music_player = None
         
-        self.window.close()
-        try:
-            subprocess.call([sys.executable, "menu.py"])
-        except Exception as e:
-            print(f"Ошибка запуска меню: {e}")
-            sys.exit()
+        go(self.window, "menu")
 
 
 #  ЭКРАН ЗАВЕРШЕНИЯ ИГРЫ 
 class GameCompleteView(arcade.View):
-    def __init__(self, total_time, game_view=None):
+    def __init__(self, total_time, game_view=None, assisted=False):
         super().__init__()
         self.total_time = total_time
         self.game_view = game_view
         self.music_player = None
+        # Место в таблице рекордов посчитает фоновый поток. Забег с
+        # перемоткой или загрузкой в таблицу не идет: их время не в тиках
+        self.result = None if assisted else leaderboard.submit("frog", 0, total_time)
         
         
-        self.buttons = []
+        self.panel = Panel()
         button_width = 200
         button_height = 50
         
-        self.buttons.append(Button(
-            "Играть заново", 
-            WINDOW_WIDTH // 2 - 120, 
-            250, 
-            button_width, 
-            button_height, 
-            (50, 150, 50, 255)
-        ))
-        
-        self.buttons.append(Button(
-            "Главное меню", 
-            WINDOW_WIDTH // 2 + 120, 
-            250, 
-            button_width, 
-            button_height, 
-            (150, 50, 150, 255)
-        ))
-
-    def on_show_view(self):
-        arcade.set_background_color((20, 20, 60))
-
-    def on_draw(self):
-        self.clear()
-        
-        
-        arcade.draw_text(
+        self.panel.add_label(
             "ПОЗДРАВЛЯЕМ!", 
             WINDOW_WIDTH // 2, 
-            450, 
+            620, 
             arcade.color.GOLD, 
             font_size=48, 
             anchor_x="center"
         )
         
-        arcade.draw_text(
+        self.panel.add_label(
             "Вы успешно прошли все уровни!", 
             WINDOW_WIDTH // 2, 
-            400, 
+            570, 
             arcade.color.WHITE, 
             font_size=24, 
             anchor_x="center"
         )
         
-        arcade.draw_text(
+        self.panel.add_label(
             f"Общее время прохождения: {self.total_time:.1f} секунд", 
             WINDOW_WIDTH // 2, 
-            350, 
+            520, 
             arcade.color.LIGHT_BLUE, 
             font_size=20, 
             anchor_x="center"
@@ -280,69 +233,108 @@ class GameCompleteView(arcade.View):
         
         # Система оценки результата
         if self.total_time < 60:
-            arcade.draw_text(
+            self.panel.add_label(
                 "🏆 ОТЛИЧНЫЙ РЕЗУЛЬТАТ! 🏆", 
                 WINDOW_WIDTH // 2, 
-                320, 
+                490, 
                 arcade.color.YELLOW, 
                 font_size=18, 
                 anchor_x="center"
             )
         elif self.total_time < 120:
-            arcade.draw_text(
+            self.panel.add_label(
                 "⭐ ХОРОШИЙ РЕЗУЛЬТАТ! ⭐", 
                 WINDOW_WIDTH // 2, 
-                320, 
+                490, 
                 arcade.color.LIGHT_GREEN, 
                 font_size=18, 
                 anchor_x="center"
             )
         
-        for button in self.buttons:
-            button.draw()
+        self.rank_label = self.panel.add_label(
+            "Записываем результат..." if self.result else
+            "С перемоткой или загрузкой результат не записывается", 
+            WINDOW_WIDTH // 2, 
+            445, 
+            arcade.color.WHITE, 
+            font_size=18, 
+            anchor_x="center"
+        )
+        self.top_labels = [
+            self.panel.add_label("", WINDOW_WIDTH // 2, 405 - i*27, arcade.color.LIGHT_GRAY,
+                                 font_size=16, anchor_x="center")
+            for i in range(leaderboard.TOP_ROWS)
+        ]
+        
+        self.panel.add_button(
+            "Играть заново", 
+            WINDOW_WIDTH // 2 - 120, 
+            210, 
+            button_width, 
+            button_height, 
+            (50, 150, 50, 255),
+            self.play_again
+        )
+        
+        self.panel.add_button(
+            "Главное меню", 
+            WINDOW_WIDTH // 2 + 120, 
+            210, 
+            button_width, 
+            button_height, 
+            (150, 50, 150, 255),
+            self.return_to_menu
+        )
         
-        arcade.draw_text(
+        self.panel.add_label(
             "Нажмите ESC для возврата в главное меню или R для перезапуска", 
             WINDOW_WIDTH // 2, 
-            150, 
+            130, 
             arcade.color.LIGHT_GRAY, 
             font_size=16, 
             anchor_x="center"
         )
 
+    def on_show_view(self):
+        arcade.set_background_color((20, 20, 60))
+
+    def on_draw(self):
+        self.clear()
+        self.panel.draw()
+
+    def on_update(self, delta_time):
+        if self.result and self.result.done.is_set():
+            self.show_result(self.result)
+            self.result = None
+
+    def show_result(self, result):
+        if result.error:
+            self.rank_label.text = result.error
+            return
+        self.rank_label.text = f"Место в таблице рекордов: {result.rank} из {result.total}"
+        for place, (label, (_, name, score, _)) in enumerate(zip(self.top_labels, result.top), 1):
+            label.text = f"{place}. {name} - {score:.1f} с"
+
     def on_mouse_motion(self, x, y, dx, dy):
-        
-        for button in self.buttons:
-            button.update_hover(x, y)
+        self.panel.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        
-        for btn in self.buttons:
-            if btn.contains_point(x, y):
-                if btn.text == "Играть заново":
-                    
-                    if self.game_view and hasattr(self.game_view, 'music_player') and self.game_view.music_player:
-                        self.game_view.music_player.pause()
-                        self.game_view.music_player = None
-                
-                    game_view = GameView()
-                    self.window.show_view(game_view)
-                elif btn.text == "Главное меню":
-                    self.return_to_menu()
-                break
+        self.panel.on_mouse_press(x, y)
 
     def on_key_press(self, key, modifiers):
         
         if key == arcade.key.ESCAPE:
             self.return_to_menu()
         elif key == arcade.key.R:
-            
-            if self.game_view and hasattr(self.game_view, 'music_player') and self.game_view.music_player:
-                self.game_view.music_player.pause()
-                self.game_view.music_player = None
-            
-            game_view = GameView()
-            self.window.show_view(game_view)
+            self.play_again()
+
+    def play_again(self):
+        if self.game_view and hasattr(self.game_view, 'music_player') and self.game_view.music_player:
+            self.game_view.music_player.pause()
+            self.game_view.music_player = None
+        
+        game_view = GameView()
+        self.window.show_view(game_view)
 
     def return_to_menu(self):
         
@@ -354,72 +346,67 @@ class GameCompleteView(arcade.View):
             self.music_player.pause()
             self.music_player = None
         
-        self.window.close()
-        try:
-            subprocess.call([sys.executable, "menu.py"])
-        except Exception as e:
-            print(f"Ошибка запуска меню: {e}")
-            sys.exit()
-
-
-# СПРАЙТЫ И ИИ 
-class Enemy(arcade.Sprite):
-    def __init__(self, image_path, scale, patrol_start_x, patrol_end_x, center_y):
-        super().__init__(image_path, scale)
-        
-        self.patrol_start_x = patrol_start_x
-        self.patrol_end_x = patrol_end_x
-        self.center_y = center_y
-        self.center_x = patrol_start_x
-        self.direction = 1
-        self.speed = ENEMY_SPEED
-        
-    def update(self, delta_time=None):
-        
-        self.center_x += self.speed * self.direction
-        
-        if self.center_x <= self.patrol_start_x:
-            self.center_x = self.patrol_start_x
-            self.direction = 1
-        elif self.center_x >= self.patrol_end_x:
-            self.center_x = self.patrol_end_x
-            self.direction = -1
+        go(self.window, "menu")
 
 
 # ОСНОВНАЯ ИГРА 
 class GameView(arcade.View):
-    def __init__(self):
+    def __init__(self, recorder=None):
         super().__init__()
 
         
-        self.player_list = self.wall_list = self.coin_list = None
-        self.portal_list = self.lava_list = None
+        self.player_list = self.portal_list = None
+        # неподвижные части уровня: стены, лава, монеты
+        self.streamer = None
         self.background_list = self.gui_sprite_list = None
         self.enemy_list = None
+        # тело симуляции -> спрайт
+        self.sprites = {}
+        # Тела подобранных монет и убитых врагов, спрайтов которых сейчас
+        # нет на экране; sync_to_world() возвращает их на место
+        self.collected = []
+        self.killed = []
 
         self.player_sprite = self.bone_icon_sprite = None
         self.camera = self.gui_camera = None
+        self.camera_position = self.camera_start = None
+        # уровень, для которого построены спрайты
+        self.built_level = None
 
         
-        self.level = 1
-        self.coins_required = 0
-        self.coin_count = 0
-        self.portal_active = False
+        self.world = None
 
-        
-        self.dx = self.dy = 0
-        self.on_ground = False
-        self.double_jumped = False
+        # Фиксированный шаг симуляции
+        self.accumulator = 0.0
+        self.prev_positions = []
+        self.prev_camera_position = None
 
         
         self.show_hitboxes = False
         self.show_coordinates = False
-        self.show_interact_prompt = False
-        self.current_interact_obj = None
+        self.debug = DebugOverlay(WINDOW_WIDTH, WINDOW_HEIGHT, GRID_SPACING)
+        self.show_profiler = False
+        self.profiler = FrameProfiler()
+        self.profiler_overlay = ProfilerOverlay(self.profiler, WINDOW_WIDTH-370, WINDOW_HEIGHT-200,
+                                                360, 190)
         self.message = ""
-        self.message_time = 0
+        # тик, после которого сообщение пропадает
+        self.message_tick = 0
+
+        # replay.InputRecorder, если ввод записывается
+        self.recorder = recorder
+
+        # История тиков для перемотки, пока зажата R
+        self.rewind = RewindBuffer()
+        self.rewinding = False
+        # (уровень, тик входа) для времени уровня в таблице рекордов;
+        # None, если на уровне была загрузка или перемотка
+        self.level_start = None
+        # Была ли в этом забеге загрузка или перемотка: они возвращают
+        # world.ticks назад, и общее время перестает быть честным
+        self.assisted = False
 
-        self.start_time = time.time()
+        self.hud = self.create_hud()
 
         
         self.sound_jump = None
@@ -427,31 +414,30 @@ class GameView(arcade.View):
         self.sound_portal = None
         self.music_main = None
         self.music_minigame = None
-        self.portal_sound_playing = False
         self.music_player = None
         
         try:
-            self.sound_jump = arcade.load_sound("jump3.wav")
+            self.sound_jump = assets.sound("jump3.wav")
         except:
             print("Не удалось загрузить jump3.wav")
         
         try:
-            self.sound_coin = arcade.load_sound("bonus.wav")
+            self.sound_coin = assets.sound("bonus.wav")
         except:
             print("Не удалось загрузить bonus.wav")
         
         try:
-            self.sound_portal = arcade.load_sound("lose.wav")
+            self.sound_portal = assets.sound("lose.wav")
         except:
             print("Не удалось загрузить lose.wav")
         
         try:
-            self.music_main = arcade.load_sound("music-1.wav")
+            self.music_main = assets.sound("music-1.wav")
         except:
             print("Не удалось загрузить music-1.wav")
         
         try:
-            self.music_minigame = arcade.load_sound("b19fd19cd041148.wav")
+            self.music_minigame = assets.sound("b19fd19cd041148.wav")
         except:
             print("Не удалось загрузить b19fd19cd041148.wav")
 
@@ -460,40 +446,32 @@ class GameView(arcade.View):
         self.frog_textures_left = []
         
         for i in range(1, 10):
+            frame = f"frogg/frog{i}.png"
             try:
-                right_tex = arcade.load_texture(f"frogg/frog{i}.png")
-                self.frog_textures_right.append(right_tex)
-                
-                flipped_pil = right_tex.image.transpose(Image.FLIP_LEFT_RIGHT)
-                left_tex = arcade.Texture(name=f"frog{i}_left", image=flipped_pil)
-                self.frog_textures_left.append(left_tex)
+                self.frog_textures_right.append(assets.texture(frame))
+                self.frog_textures_left.append(assets.flipped_texture(frame))
             except:
-                right_tex = arcade.load_texture("frog.png")
-                self.frog_textures_right.append(right_tex)
-                flipped_pil = right_tex.image.transpose(Image.FLIP_LEFT_RIGHT)
-                left_tex = arcade.Texture(name=f"frog_backup{i}_left", image=flipped_pil)
-                self.frog_textures_left.append(left_tex)
+                self.frog_textures_right.append(assets.texture("frog.png"))
+                self.frog_textures_left.append(assets.flipped_texture("frog.png"))
 
         
         self.animation_frame = 0
         self.animation_direction = 1
-        self.last_animation_time = time.time()
-        self.facing_right = True
+        self.animation_timer = 0.0
 
         self.base_texture = self.frog_textures_right[0]
         
+        self.world = World(geometry=assets.geometry, profiler=self.profiler)
+        self.world.events.clear()
         self.setup()
+        self.rewind.record(self.world)
+        self.level_start = (self.world.level, self.world.ticks)
+
+    @property
+    def level(self):
+        return self.world.level
 
     def setup(self):
-        
-        self.coin_count = 0
-        self.portal_active = False
-        self.portal_sound_playing = False
-        
-        if not hasattr(self, '_game_started'):
-            self.start_time = time.time()
-            self._game_started = True
-        
         self.build_level()
         
         
@@ -504,304 +482,297 @@ class GameView(arcade.View):
         if self.music_main and not self.music_player:
             self.music_player = arcade.play_sound(self.music_main, volume=0.3)
 
+        # Пока играется этот уровень, в фоне готовим текстуры следующего
+        if self.level < LAST_LEVEL:
+            assets.prefetch(levels.level_textures(self.level + 1, assets.geometry))
+
     def build_level(self):
-        lvl = self.level
-        plat_prefix = f"{lvl}plat"
-        coin_file = f"iscra{lvl}.png"
-        portal_off = f"port{lvl}.png"
-        portal_on = f"1port{lvl}.png"
-        back_file = f"back{lvl}.png"
+        """Строит спрайты по шаблону текущего уровня, как в его начале"""
+        world = self.world
+        back_file = world.level_data.background
 
         
-        self.wall_list = arcade.SpriteList(use_spatial_hash=True)
-        self.coin_list = arcade.SpriteList(use_spatial_hash=True)
         self.portal_list = arcade.SpriteList()
-        self.lava_list = arcade.SpriteList()
         self.background_list = arcade.SpriteList()
         self.gui_sprite_list = arcade.SpriteList()
         self.enemy_list = arcade.SpriteList()
+        self.sprites = {}
 
         # Фон
-        if os.path.isfile(back_file):
-            bg = arcade.Sprite(
+        if back_file and has_asset(back_file):
+            bg = assets.sprite(
                 back_file, center_x=WINDOW_WIDTH/2, center_y=WINDOW_HEIGHT/2
             )
             bg.width, bg.height = WINDOW_WIDTH*1.5, WINDOW_HEIGHT*1.5
             self.background_list.append(bg)
 
         # создание игрока
-        self.player_sprite = arcade.Sprite(scale=PLAYER_SCALING)
+        self.player_sprite = arcade.Sprite(
+            scale=PLAYER_SCALING / assets.texture_scale(PLAYER_TEXTURE))
         self.player_sprite.texture = self.frog_textures_right[0]
-        self.player_sprite.center_x, self.player_sprite.center_y = 64, 128
+        self.player_sprite.position = world.player.position
         self.player_sprite.sync_hit_box_to_texture()
         self.player_list = arcade.SpriteList()
         self.player_list.append(self.player_sprite)
-
-        # Создание платформ пола
-        if lvl == 1:
-            manual_floor_specs = [
-                ("1plat1.png", 100, 50, TILE_SCALING*0.35),
-                ("1plat2.png", 600, 128, TILE_SCALING*0.35),
-                ("1plat3.png", 1860, 240, TILE_SCALING*0.30),
-            ]
-        elif lvl == 2:
-            manual_floor_specs = [
-                ("2plat.png", 140, 40, TILE_SCALING*0.30),
-                ("2plat.png", 768, 40, TILE_SCALING*0.30),
-            ]
-        else:
-            manual_floor_specs = [
-                ("3plat1.png", 300, 60, TILE_SCALING*0.45),
-                ("3plat.png", -690, 60, TILE_SCALING*0.45),
-            ]
-        
-        for tex, cx, cy, sc in manual_floor_specs:
-            p = arcade.Sprite(tex, scale=sc)
-            p.center_x, p.center_y = cx, cy
-            self.wall_list.append(p)
-
-        # Лава для уровня 2
-        if lvl == 2:
-            lava = arcade.Sprite("image-Photoroom (12).png", scale=2)
-            # lava.top = self.wall_list[-1].top
-            lava.center_x = 500
-            lava.center_y = -130
-            self.lava_list.append(lava)
-
-        
-        
-        
-        
-        
-        if lvl == 1:
-            coin_specs = [(1504,907),
-                        (1860, 330),
-                        (-320, 320)]
-        elif lvl == 2:
-            coin_specs = [(128,340),
-                           (500,380)]
-        else:
-            coin_specs = [(300,400),
-                          (100, 640),
-                        (100, 800),
-                        (-128, 128)]
-        for cx,cy in coin_specs:
-            c = arcade.Sprite(coin_file, scale=COIN_SCALING*0.3)
-            c.center_x, c.center_y = cx, cy
-            self.coin_list.append(c)
-        self.coins_required = len(self.coin_list)
-
-
-        #  координаты портала для каждого уровня:
-        if lvl == 1:
-            portal_x, portal_y = 1500, 130   
-        elif lvl == 2:
-            portal_x, portal_y = 580, 896   
-        else:
-            portal_x, portal_y = 1927, 320    
-        portal = arcade.Sprite(portal_off, scale=0.3)
-        
-        portal.center_x, portal.center_y = portal_x, portal_y
-        portal.active_tex = arcade.load_texture(portal_on)
-        portal.active = False
-        self.portal_list.append(portal)
-
-        # Платформа под порталом
-        if lvl == 1:
-            plat_tex = "1plat1.png"
-        elif lvl == 2:
-            plat_tex = "2plat.png"
-        else:
-            plat_tex = "3plat.png"
-        plat = arcade.Sprite(plat_tex, scale=TILE_SCALING*0.20)
-        plat.center_x = portal.center_x
-        
-        if lvl == 1:
-            offset = 140
-        elif lvl == 2:
-            offset = 50
-        else:
-            offset = 140
-        plat.center_y = portal.center_y - offset
-        self.wall_list.append(plat)
-
-        
-        
-        
-        
-        
-        if lvl == 1:
-            platform_specs = [
-                ("1plat1.png", -320, 200, 0.1),
-                ("1plat1.png", 832, 350, 0.1),
-                
-                ("1plat2.png", 1100, 500, 0.2),
-                ("1plat3.png", 1500, 740, 0.2),
-            ]
-        elif lvl == 2:
-            platform_specs = [
-                ("2plat.png", 500, 256, 0.15),
-                ("2plat.png", 900, 450, 0.15),
-                ("2plat.png", -128, 192, 0.15),
-                ("2plat.png", 704, 700, 0.15),
-            ]
-        else:
-            platform_specs = [
-                ("3plat3.png", 360, 196, 0.3),
-                ("3plat1.png", 700, 0, 0.40),
-                ("3plat2.png", 100, 450, 0.5),
-                ("3plat3.png", 1200, 20, 0.55),
-                ("image-Photoroom (13).png", 1700, 0, 0.6),
-                ("3plat2.png", -128, -128, 0.6),
-                ("3plat2.png", 64, -64, 0.4),
-            ]
-        for tex, cx, cy, sc in platform_specs:
-            p = arcade.Sprite(tex, scale=sc)
-            p.center_x, p.center_y = cx, cy
-            self.wall_list.append(p)
-
-        self.bone_icon_sprite = arcade.Sprite(coin_file, scale=16/32,
-                                              center_x=10+16, center_y=WINDOW_HEIGHT-44)
-        self.gui_sprite_list.append(self.bone_icon_sprite)
+        self.sprites[world.player] = self.player_sprite
+
+        # Стены, лава и монеты подгружаются чанками вокруг камеры
+        self.streamer = ChunkStreamer(("walls", "coins", "lava"), self.body_sprite, self.sprites)
+        for layer, bodies in (("walls", world.walls), ("walls", world.tiles),
+                              ("lava", world.lava), ("coins", world.template.coins)):
+            for body in bodies:
+                # Коллайдеры из карт Tiled невидимы, рисуются их тайлы
+                if body.texture is not None:
+                    self.streamer.add(layer, body)
+
+        for bodies, sprite_list in (([world.portal], self.portal_list),
+                                    (world.enemy_system.bodies, self.enemy_list)):
+            for body in bodies:
+                sprite = self.body_sprite(body)
+                sprite_list.append(sprite)
+                self.sprites[body] = sprite
+
+        portal = self.sprites[world.portal]
+        portal.inactive_tex = portal.texture
+        portal.active_tex = assets.texture(world.portal_active_texture)
+        self.collected = []
+        self.killed = []
+
+        # В уровне может не быть монет, тогда нет и счетчика
+        coin_texture = world.level_data.coin_texture
+        self.bone_icon_sprite = None
+        if coin_texture is not None:
+            self.bone_icon_sprite = assets.sprite(coin_texture, scale=COIN_ICON_SCALING,
+                                                  center_x=10+16, center_y=WINDOW_HEIGHT-44)
+            self.gui_sprite_list.append(self.bone_icon_sprite)
+        self.hud.show("coins", coin_texture is not None)
 
         self.camera = arcade.Camera2D()
         self.gui_camera = arcade.Camera2D()
-
-        self.dx = self.dy = 0
-        self.on_ground = False
-        self.double_jumped = False
-
-        # Создание врагов 
-        
-        if lvl == 1:
-            enemy_specs = [
-                (250, 450, 160),    
-                (1600, 1900, 1000),    
-            ]
-        elif lvl == 2:
-            enemy_specs = [
-                (350, 700, 400)       
-            ]
-        else:  
-            enemy_specs = [
-                (200, 700, 410),    
-                ]
-        
-        
-        for start_x, end_x, y in enemy_specs:
-            enemy = Enemy("image-Photoroom (14).png", ENEMY_SCALING, start_x, end_x, y)
-            self.enemy_list.append(enemy)
-
-    def hits(self, sprite, group):
-        return [s for s in group if (
-            sprite.right > s.left and sprite.left < s.right and
-            sprite.top > s.bottom and sprite.bottom < s.top)]
+        self.camera_start = tuple(self.camera.position)
+        self.built_level = world.level
+        self.reset_view()
+
+    def reset_view(self, position=None):
+        """Камера в position (по умолчанию - как при постройке уровня)"""
+        position = position or self.camera_start
+        self.camera_position = position
+        self.camera.position = position
+        self.accumulator = 0.0
+        self.prev_positions = []
+        self.prev_camera_position = None
+        self.streamer.update(*self.view_rect(self.camera_position))
+
+    def respawn(self):
+        """
+        Спрайты под World.reset(): возвращает монеты и врагов, гасит портал
+        и ставит игрока на старт. Ни уровень, ни музыка не перезапускаются.
+        """
+        self.sync_to_world()
+        self.player_sprite.texture = self.frog_textures_right[0]
+        self.reset_view()
+
+    def sync_to_world(self):
+        """
+        Приводит спрайты к текущему состоянию мира (после перезапуска,
+        загрузки или перемотки): возвращает монеты и врагов, которые снова
+        есть, убирает пропавших, переключает портал. Трогает только то,
+        что поменялось, камеру не двигает.
+        """
+        world = self.world
+        if world.level != self.built_level:
+            self.build_level()
+
+        present = set(map(id, world.coins))
+        collected = []
+        for coin in self.collected:
+            if id(coin) in present:
+                self.streamer.add("coins", coin)
+            else:
+                collected.append(coin)
+        gone = set(map(id, collected))
+        for coin in world.template.coins:
+            if id(coin) not in present and id(coin) not in gone:
+                self.streamer.remove("coins", coin)
+                collected.append(coin)
+        self.collected = collected
+
+        alive = set(map(id, world.enemies))
+        killed = []
+        for enemy in self.killed:
+            if id(enemy) in alive:
+                self.enemy_list.append(self.sprites[enemy])
+            else:
+                killed.append(enemy)
+        dead = set(map(id, killed))
+        for enemy in world.enemy_system.bodies:
+            sprite = self.sprites[enemy]
+            sprite.position = enemy.position
+            if id(enemy) not in alive and id(enemy) not in dead:
+                sprite.remove_from_sprite_lists()
+                killed.append(enemy)
+        self.killed = killed
+
+        portal = self.sprites[world.portal]
+        texture = portal.active_tex if world.portal_active else portal.inactive_tex
+        if portal.texture is not texture:
+            portal.texture = texture
+        self.player_sprite.position = world.player.position
+
+    def save_game(self):
+        savegame.save(self.world)
+
+    def load_game(self):
+        """Загружает последнее сохранение; возвращает текст ошибки или None"""
+        if self.recorder:
+            return "Во время записи ввода загрузка недоступна"
+        path = savegame.latest()
+        if path is None:
+            return "Сохранений пока нет"
+        try:
+            savegame.load(self.world, path)
+        except (OSError, ValueError) as e:
+            return f"Не удалось загрузить: {e}"
+        self.world.events.clear()
+        self.sync_to_world()
+        self.reset_view(self.world.player.position)
+        # Перемотка не должна уводить в историю до загрузки
+        self.rewind.clear()
+        self.rewind.record(self.world)
+        self.assisted = True
+        self.level_start = None
+        return None
+
+    def body_sprite(self, body):
+        sprite = assets.sprite(body.texture, scale=body.scale)
+        sprite.position = body.position
+        return sprite
+
+    def view_rect(self, position):
+        """left, bottom, right, top того, что видит камера в точке position"""
+        x, y = position
+        return (x - WINDOW_WIDTH/2, y - WINDOW_HEIGHT/2,
+                x + WINDOW_WIDTH/2, y + WINDOW_HEIGHT/2)
 
     def on_draw(self):
+        profiler = self.profiler
+        profiler.begin("draw_background")
         self.clear()
+        self.apply_interpolation()
         if self.background_list:
             self.background_list.draw()
+        profiler.begin("draw_world")
         self.camera.use()
-        self.wall_list.draw()
-        self.coin_list.draw()
+        view = self.view_rect(self.camera.position)
+        self.streamer.draw("walls", *view)
+        self.streamer.draw("coins", *view)
         self.portal_list.draw()
-        self.lava_list.draw()
+        self.streamer.draw("lava", *view)
         self.enemy_list.draw()  
         self.player_list.draw()
         
-        if self.show_hitboxes:
-            for lst,color in ((self.wall_list,arcade.color.GREEN),
-                              (self.coin_list,arcade.color.YELLOW),
-                              (self.portal_list,arcade.color.ORANGE),
-                              (self.lava_list,arcade.color.RED),
-                              (self.enemy_list,arcade.color.PURPLE),  # Добавляем врагов в отображение хитбоксов
-                              (self.player_list,arcade.color.BLUE)):
-                for s in lst:
-                    s.draw_hit_box(color)
-                    
-        if self.show_coordinates:
-            cam_l = self.camera.position[0]-WINDOW_WIDTH//2
-            cam_b = self.camera.position[1]-WINDOW_HEIGHT//2
-            cam_r, cam_t = cam_l+WINDOW_WIDTH, cam_b+WINDOW_HEIGHT
-            sx = int(cam_l-(cam_l%GRID_SPACING))
-            for x in range(sx, int(cam_r)+GRID_SPACING, GRID_SPACING):
-                arcade.draw_line(x,cam_b,x,cam_t,arcade.color.LIGHT_GRAY,1)
-            sy = int(cam_b-(cam_b%GRID_SPACING))
-            for y in range(sy, int(cam_t)+GRID_SPACING, GRID_SPACING):
-                arcade.draw_line(cam_l,y,cam_r,y,arcade.color.LIGHT_GRAY,1)
-
-            for x in range(sx, int(cam_r) + GRID_SPACING, GRID_SPACING):
-                arcade.draw_text(
-                    f"{x}",
-                    x + 2,
-                    cam_b + 2,
-                    arcade.color.YELLOW,
-                    10,
-                    anchor_x="left"
-                )
-
-            for y in range(sy, int(cam_t) + GRID_SPACING, GRID_SPACING):
-                arcade.draw_text(
-                    f"{y}",
-                    cam_l + 2,
-                    y + 2,
-                    arcade.color.YELLOW,
-                    10,
-                    anchor_x="left"
-                )
-
-            for lst in (
-                self.player_list,
-                self.wall_list,
-                self.coin_list,
-                self.portal_list,
-                self.lava_list,
-            ):
-                for spr in lst:
-                    arcade.draw_point(
-                        spr.center_x,
-                        spr.center_y,
-                        arcade.color.RED,
-                        5,
-                    )
-                    arcade.draw_text(
-                        f"{int(spr.center_x)}, {int(spr.center_y)}",
-                        spr.center_x + 5,
-                        spr.center_y + 5,
-                        arcade.color.YELLOW,
-                        12,
-                        anchor_x="left",
-                    )
+        if self.show_hitboxes or self.show_coordinates:
+            profiler.begin("draw_debug")
+            self.draw_debug()
         
+        profiler.begin("draw_hud")
         self.gui_camera.use()
         self.gui_sprite_list.draw()
-        arcade.draw_text(f"Coins: {self.coin_count}/{self.coins_required}",
-                         10+32+5, WINDOW_HEIGHT-60, arcade.color.WHITE, 20)
-        
-        
-        arcade.draw_text(f"Уровень: {self.level}/3", 
-                         10, WINDOW_HEIGHT-100, arcade.color.WHITE, 18)
-        
-        
-        current_time = time.time() - self.start_time
-        arcade.draw_text(f"Время: {current_time:.1f}с", 
-                         10, WINDOW_HEIGHT-125, arcade.color.LIGHT_BLUE, 16)
-        
+        self.update_hud()
+        self.hud.draw()
+        if self.show_profiler:
+            profiler.begin("draw_profiler")
+            self.profiler_overlay.draw()
+        profiler.end_frame()
+
+    def visible_sprites(self, grid, left, bottom, right, top):
+        sprites = self.sprites
+        return [sprites[body] for body in grid.query(left, bottom, right, top)
+                if body in sprites]
+
+    def draw_debug(self):
+        """Отладочный слой только для того, что попадает в камеру"""
+        world = self.world
+        left = self.camera.position[0] - WINDOW_WIDTH/2
+        bottom = self.camera.position[1] - WINDOW_HEIGHT/2
+        rect = (left, bottom, left + WINDOW_WIDTH, bottom + WINDOW_HEIGHT)
+        walls = self.visible_sprites(world.wall_grid, *rect)
+        coins = self.visible_sprites(world.coin_grid, *rect)
+        lava = self.visible_sprites(world.lava_grid, *rect)
+        portal = [self.sprites[world.portal]]
+        player = [self.player_sprite]
+
+        debug = self.debug
+        debug.begin()
+        if self.show_hitboxes:
+            enemies = self.visible_sprites(world.enemy_system, *rect)
+            debug.draw_hit_boxes(((walls, arcade.color.GREEN),
+                                  (coins, arcade.color.YELLOW),
+                                  (portal, arcade.color.ORANGE),
+                                  (lava, arcade.color.RED),
+                                  (enemies, arcade.color.PURPLE),
+                                  (player, arcade.color.BLUE)))
+            debug.draw_bodies((
+                ([b for b in world.wall_grid.query(*rect) if b.texture is None],
+                 arcade.color.GREEN),
+                ([b for b in world.lava_grid.query(*rect) if b.texture is None],
+                 arcade.color.RED)))
+        if self.show_coordinates:
+            debug.draw_grid(left, bottom)
+            debug.draw_positions(player + walls + coins + portal + lava)
+        debug.draw_labels()
+
+    def create_hud(self):
+        hud = Hud()
+        hud.add("coins", "Coins: {}/{}", 10+32+5, WINDOW_HEIGHT-60,
+                arcade.color.WHITE, 20, 0, 0)
+        hud.add("level", "Уровень: {}/{}", 10, WINDOW_HEIGHT-100,
+                arcade.color.WHITE, 18, 1, LAST_LEVEL)
+        hud.add("time", "Время: {:.1f}с", 10, WINDOW_HEIGHT-125,
+                arcade.color.LIGHT_BLUE, 16, 0.0)
         # Инструкции по управлению
-        arcade.draw_text("WASD/Стрелки - движение, F - взаимодействие, ESC - меню", 
-                         WINDOW_WIDTH // 2, 20, arcade.color.LIGHT_GRAY, 14, anchor_x="center")
-        if self.show_interact_prompt:
-            arcade.draw_text("Нажмите F для взаимодействия",
-                             WINDOW_WIDTH/2,80, arcade.color.WHITE,20,anchor_x="center")
-        if self.message:
-            arcade.draw_text(self.message, WINDOW_WIDTH/2, WINDOW_HEIGHT/2,
-                             arcade.color.YELLOW,24,anchor_x="center")
+        hud.add("controls", "WASD/Стрелки - движение, F - взаимодействие, R - назад, ESC - меню",
+                WINDOW_WIDTH // 2, 20, arcade.color.LIGHT_GRAY, 14, anchor_x="center")
+        hud.add("interact", "Нажмите F для взаимодействия", WINDOW_WIDTH/2, 80,
+                arcade.color.WHITE, 20, anchor_x="center")
+        hud.add("message", "{}", WINDOW_WIDTH/2, WINDOW_HEIGHT/2,
+                arcade.color.YELLOW, 24, "", anchor_x="center")
+        hud.add("rewind", "<< Перемотка", WINDOW_WIDTH/2, WINDOW_HEIGHT-50,
+                arcade.color.LIGHT_BLUE, 20, anchor_x="center")
+        return hud
+
+    def update_hud(self):
+        hud, world = self.hud, self.world
+        hud.set("coins", world.coin_count, world.coins_required)
+        hud.set("level", self.level, LAST_LEVEL)
+        # Время меняет текст раз в десятую секунды
+        hud.set("time", round(world.elapsed, 1))
+        hud.show("interact", bool(world.interact_target))
+        hud.set("message", self.message)
+        hud.show("message", bool(self.message))
+        hud.show("rewind", self.rewinding)
+
+    def apply_interpolation(self):
+        """Ставит спрайты и камеру между двумя последними шагами физики"""
+        if not self.prev_positions:
+            return
+        alpha = self.accumulator / SIMULATION_STEP
+        for sprite, body, px, py in self.prev_positions:
+            sprite.position = (px + (body.center_x - px) * alpha,
+                               py + (body.center_y - py) * alpha)
+        if self.prev_camera_position is not None:
+            cx, cy = self.camera_position
+            px, py = self.prev_camera_position
+            self.camera.position = (px + (cx - px) * alpha, py + (cy - py) * alpha)
 
     def on_update(self, dt):
+        profiler = self.profiler
+        profiler.begin_frame()
+        profiler.begin("animation")
         # Обновляем анимацию 
-        current_time = time.time()
-        if current_time - self.last_animation_time >= BREATHING_ANIMATION_SPEED:
-            self.last_animation_time = current_time
+        self.animation_timer += dt
+        if self.animation_timer >= BREATHING_ANIMATION_SPEED:
+            self.animation_timer = 0.0
             
             
             self.animation_frame += self.animation_direction
@@ -813,154 +784,178 @@ class GameView(arcade.View):
                 self.animation_direction = 1
             
             
-            if self.facing_right:
-                self.player_sprite.texture = self.frog_textures_right[self.animation_frame]
-            else:
-                self.player_sprite.texture = self.frog_textures_left[self.animation_frame]
+            self.update_player_texture()
 
-        if self.message and time.time()>self.message_time:
+        if self.message and self.world.ticks >= self.message_tick:
             self.message=""
 
-        self.show_interact_prompt=False
-        self.current_interact_obj=None
-        for p in self.portal_list:
-            if math.hypot(p.center_x-self.player_sprite.center_x,
-                          p.center_y-self.player_sprite.center_y)<=INTERACT_DISTANCE:
-                self.show_interact_prompt=True
-                self.current_interact_obj=p
+        # Копим реальное время и отрабатываем его шагами фиксированной длины
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= SIMULATION_STEP:
+            if steps >= MAX_SUBSTEPS:
+                # Не догоняем бесконечно после долгого подвисания
+                self.accumulator %= SIMULATION_STEP
                 break
-
-        # Обновляем врагов
-        self.enemy_list.update()
-
-        self.dy -= GRAVITY
-
-        self.player_sprite.center_x += self.dx
-        if self.hits(self.player_sprite, self.wall_list):
-            self.player_sprite.center_x -= self.dx
-
-        self.player_sprite.center_y += self.dy
-        hy = self.hits(self.player_sprite, self.wall_list)
-        if hy:
-            if self.dy>0:
-                self.player_sprite.top = min(s.bottom for s in hy)
+            self.accumulator -= SIMULATION_STEP
+            steps += 1
+            profiler.begin("interpolation")
+            self.prev_positions = [(self.sprites[b], b, b.center_x, b.center_y)
+                                   for b in (self.world.player, *self.world.enemies)]
+            self.prev_camera_position = self.camera_position
+            if self.rewinding:
+                profiler.begin("rewind")
+                if self.rewind.step_back(self.world):
+                    self.sync_to_world()
+                    self.assisted = True
+                    self.level_start = None
             else:
-                self.player_sprite.bottom = max(s.top for s in hy)
-                self.on_ground=True
-                self.double_jumped=False
-            self.dy=0
-        else:
-            self.on_ground=False
-
-        
-        enemy_hits = self.hits(self.player_sprite, self.enemy_list)
-        for enemy in enemy_hits:
-            # Проверяем, атакует ли игрок сверху
-            if (self.dy < 0 and 
-                self.player_sprite.center_y > enemy.center_y + enemy.height/3):
-                
-                enemy.remove_from_sprite_lists()
-                # Отскок игрока вверх
-                self.dy = ENEMY_BOUNCE_FORCE
-                
-                self.message = "Враг повержен!"
-                self.message_time = time.time() + 1
-            else:
-                
-                self.message = "Вы погибли! Уровень перезапускается..."
-                self.message_time = time.time() + 1.5
-                # Перезапускаем текущий уровень 
-                arcade.unschedule(self.restart_level)
-                arcade.schedule(self.restart_level, 0.5)
+                self.world.step()
+                profiler.begin("rewind")
+                self.rewind.record(self.world)
+            profiler.begin("events")
+            self.handle_events()
+            if self.world.completed:
                 return
+            profiler.begin("camera")
+            self.update_camera()
+
+        profiler.begin("streaming")
+        self.streamer.update(*self.view_rect(self.camera_position))
+        profiler.begin("interpolation")
+        for sprite, body, _, _ in self.prev_positions:
+            sprite.position = body.position
+        self.camera.position = self.camera_position
+        profiler.end()
+
+    def update_camera(self):
+        tx,ty=self.world.player.position
+        cx,cy=self.camera_position
+        self.camera_position=(cx+(tx-cx)*0.1, cy+(ty-cy)*0.1)
+
+    def show_message(self, text, seconds):
+        """Сообщение по центру экрана; время считается тиками симуляции"""
+        self.message = text
+        self.message_tick = self.world.ticks + round(seconds * SIMULATION_RATE)
+
+    def handle_events(self):
+        """Звуки, сообщения и спрайты по событиям симуляции"""
+        events = self.world.events
+        self.world.events = []
+        for event in events:
+            kind = event[0]
+            if kind == "level":
+                self.finish_level()
+                self.level_start = (event[1], self.world.ticks)
+                self.setup()
+                # Контрольная точка на каждом переходе через портал
+                savegame.save(self.world, savegame.CHECKPOINT_PATH)
+            elif kind == "respawn":
+                # Если лава отправила на другой уровень, он строится без смены музыки
+                self.respawn()
+                if self.level_start is None or self.level_start[0] != event[1]:
+                    self.level_start = (event[1], self.world.ticks)
+            elif kind == "jump":
+                if self.sound_jump:
+                    arcade.play_sound(self.sound_jump, volume=0.4)
+            elif kind == "coin":
+                self.streamer.remove("coins", event[1])
+                self.collected.append(event[1])
+                if self.sound_coin:
+                    arcade.play_sound(self.sound_coin, volume=0.5)
+            elif kind == "portal":
+                portal = self.sprites[self.world.portal]
+                portal.texture = portal.active_tex
+                if self.sound_portal:
+                    arcade.play_sound(self.sound_portal, volume=0.4)
+            elif kind == "enemy_killed":
+                self.sprites[event[1]].remove_from_sprite_lists()
+                self.killed.append(event[1])
+                self.show_message("Враг повержен!", 1)
+            elif kind == "death":
+                self.show_message("Вы погибли! Уровень перезапускается...", 1.5)
+            elif kind == "need_coins":
+                self.show_message(f"Не хватает ещё {event[1]} монет", 2)
+            elif kind == "completed":
+                self.finish_level()
+                total_time = self.world.elapsed
+                complete_view = GameCompleteView(total_time, self, self.assisted)
+                self.window.show_view(complete_view)
+
+    def finish_level(self):
+        """Время пройденного уровня в таблицу рекордов, если он пройден без перемотки"""
+        if self.level_start is not None:
+            level, tick = self.level_start
+            leaderboard.submit("frog", level, (self.world.ticks - tick) * SIMULATION_STEP)
+            self.level_start = None
+
+    def update_player_texture(self):
+        if self.world.facing_right:
+            self.player_sprite.texture = self.frog_textures_right[self.animation_frame]
+        else:
+            self.player_sprite.texture = self.frog_textures_left[self.animation_frame]
 
-        for coin in self.hits(self.player_sprite, self.coin_list):
-            coin.remove_from_sprite_lists()
-            self.coin_count+=1
-            
-            if self.sound_coin:
-                arcade.play_sound(self.sound_coin, volume=0.5)
-
-        if not self.portal_active and self.coin_count>=self.coins_required:
-            for p in self.portal_list:
-                p.texture=p.active_tex
-                p.active=True
-            self.portal_active=True
-            self.portal_sound_playing = False  
-
-        # Обработка звука портала
-        if self.portal_active and not self.portal_sound_playing:
-            if self.sound_portal:
-                arcade.play_sound(self.sound_portal, volume=0.4)
-                self.portal_sound_playing = True
-        elif not self.portal_active and self.portal_sound_playing:
-            
-            self.portal_sound_playing = False
-
-        if self.level==2 and self.hits(self.player_sprite, self.lava_list):
-            self.level=1
-            self.setup()
-            return
+    def press(self, action):
+        if self.recorder:
+            self.recorder.press(self.world.ticks, action)
+        self.world.press(action)
 
-        tx,ty=self.player_sprite.position
-        cx,cy=self.camera.position
-        self.camera.position=(cx+(tx-cx)*0.1, cy+(ty-cy)*0.1)
+    def release(self, action):
+        if self.recorder:
+            self.recorder.release(self.world.ticks, action)
+        self.world.release(action)
 
-    def restart_level(self, delta_time):
-        """Перезапускает текущий уровень"""
-        arcade.unschedule(self.restart_level)
-        self.setup()
+    def on_hide_view(self):
+        # Пауза, конец игры или выход в меню: запись на диске должна быть свежей
+        if self.recorder:
+            self.recorder.save(self.world)
 
     def on_key_press(self, key, mods):
         if key in (arcade.key.LEFT, arcade.key.A):
-            self.dx=-PLAYER_SPEED
-            self.facing_right = False
+            self.press("left")
             # кадр анимации для левого направления
-            self.player_sprite.texture = self.frog_textures_left[self.animation_frame]
+            self.update_player_texture()
         elif key in (arcade.key.RIGHT, arcade.key.D):
-            self.dx=PLAYER_SPEED
-            self.facing_right = True
+            self.press("right")
             # кадр анимации для правого направления
-            self.player_sprite.texture = self.frog_textures_right[self.animation_frame]
+            self.update_player_texture()
         elif key in (arcade.key.UP, arcade.key.W):
-            if self.on_ground:
-                self.dy=PLAYER_JUMP
-                #  звук прыжка
-                if self.sound_jump:
-                    arcade.play_sound(self.sound_jump, volume=0.4)
-            elif not self.double_jumped:
-                self.dy=PLAYER_DOUBLE_JUMP
-                self.double_jumped=True
-               
-                if self.sound_jump:
-                    arcade.play_sound(self.sound_jump, volume=0.4)
+            self.press("jump")
         elif key==arcade.key.Q:
             self.show_hitboxes=not self.show_hitboxes
         elif key==arcade.key.E:
             self.show_coordinates=not self.show_coordinates
+        elif key==arcade.key.P:
+            if mods & arcade.key.MOD_SHIFT:
+                self.export_profile()
+            else:
+                self.show_profiler=not self.show_profiler
         elif key==arcade.key.ESCAPE:
             
             pause_menu = PauseMenuView(self)
             self.window.show_view(pause_menu)
-        elif key==arcade.key.F and self.current_interact_obj:
-            p=self.current_interact_obj
-            if self.portal_active:
-                if self.level<3:
-                    self.level+=1
-                    self.setup()
-                else:
-                   
-                    total_time = time.time() - self.start_time
-                    complete_view = GameCompleteView(total_time, self) 
-                    self.window.show_view(complete_view)
-            else:
-                missing=self.coins_required-self.coin_count
-                self.message=f"Не хватает ещё {missing} монет"
-                self.message_time=time.time()+2
+        elif key==arcade.key.F:
+            self.press("interact")
+        elif key==arcade.key.R and not self.recorder:
+            # Перемотка ломает запись ввода, поэтому при записи ее нет
+            self.rewinding = True
+        self.handle_events()
+
+    def export_profile(self):
+        """Сохраняет кадры из профайлера в Chrome trace и CSV"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, time.strftime("frames-%Y%m%d-%H%M%S"))
+        self.profiler.export_chrome_trace(base + ".json")
+        self.profiler.export_csv(base + ".csv")
+        self.show_message(f"Профиль сохранен: {os.path.basename(base)}", 2)
 
     def on_key_release(self, key, mods):
         if key in (arcade.key.LEFT, arcade.key.A, arcade.key.RIGHT, arcade.key.D):
-            self.dx=0
+            self.release("left")
+        elif key==arcade.key.R and self.rewinding:
+            self.rewinding = False
+            # Скорость из снимка относится к прошлому вводу
+            self.release("left")
 
     def return_to_menu(self):
         """Возврат в главное меню"""
@@ -969,19 +964,25 @@ class GameView(arcade.View):
             self.music_player.pause()
             self.music_player = None
         
-        self.window.close()
-        try:
-            subprocess.call([sys.executable, "menu.py"])
-        except Exception as e:
-            print(f"Ошибка запуска меню: {e}")
-            sys.exit()
+        go(self.window, "menu")
 
-def main():
+def main(argv=None):
     """Основная функция"""
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument("--record", metavar="FILE",
+                        help="записать ввод для python replay.py FILE")
+    args = parser.parse_args(argv)
+
+    recorder = None
+    if args.record:
+        recorder = InputRecorder(args.record, geometry_tag=assets.geometry_tag)
+
     window = arcade.Window(WINDOW_WIDTH, WINDOW_HEIGHT, WINDOW_TITLE)
-    game_view = GameView()
+    game_view = GameView(recorder)
     window.show_view(game_view)
     arcade.run()
+    if recorder:
+        recorder.save(game_view.world)
 
 
 if __name__=="__main__":
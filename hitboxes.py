@@ -0,0 +1,125 @@
+"""
+Хитбоксы текстур, сохраненные на диск.
+
+Обход контура по альфа-каналу на больших картинках - самая долгая часть
+загрузки текстуры. Готовый многоугольник упрощается до MAX_POINTS вершин
+и пишется в .cache/hitboxes/<ключ>.hbx; ключ - путь картинки и ее
+assetpack.asset_stamp (хэш из индекса пака или размер и время изменения
+файла), масштаб, с которым она запечена, алгоритм и бюджет вершин.
+Повторный запуск читает файл вместо обхода.
+
+Упрощение - Visvalingam: по одной выбрасывается вершина, которая образует
+с соседями треугольник наименьшей площади. Крайние по x и y вершины не
+трогаются, так что рамка хитбокса, по которой считает симуляция, не
+меняется.
+
+Формат .hbx (little-endian): magic "FHBX", версия u16, число точек u16,
+затем точки (x f64, y f64).
+"""
+import hashlib
+import os
+import struct
+import threading
+
+from arcade import hitbox
+
+from assetpack import ASSET_DIR
+
+CACHE_DIR = os.path.join(ASSET_DIR, ".cache", "hitboxes")
+
+ALGORITHM = hitbox.algo_default
+MAX_POINTS = 16
+
+MAGIC = b"FHBX"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+POINT = struct.Struct("<dd")
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def cache_key(source_hash, scale, algorithm=ALGORITHM, budget=MAX_POINTS):
+    text = f"v{VERSION}:{source_hash}:{scale}:{algorithm.cache_name}:{budget}"
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _triangle_area(a, b, c):
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2
+
+
+def simplify(points, budget=MAX_POINTS):
+    """Многоугольник не больше чем из budget вершин с той же рамкой"""
+    points = list(points)
+    if len(points) <= budget:
+        return points
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    keep = {xs.index(min(xs)), xs.index(max(xs)), ys.index(min(ys)), ys.index(max(ys))}
+    alive = list(range(len(points)))
+    while len(alive) > max(budget, len(keep)):
+        count = len(alive)
+        best = None
+        for i in range(count):
+            index = alive[i]
+            if index in keep:
+                continue
+            area = _triangle_area(points[alive[i - 1]], points[index],
+                                  points[alive[(i + 1) % count]])
+            if best is None or area < best[0]:
+                best = (area, i)
+        del alive[best[1]]
+    return [points[i] for i in alive]
+
+
+def load(key):
+    path = os.path.join(CACHE_DIR, f"{key}.hbx")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or len(data) != HEADER.size + count * POINT.size:
+        return None
+    return list(POINT.iter_unpack(data[HEADER.size:]))
+
+
+def store(key, points):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{key}.hbx")
+    # Пишет и фоновый поток prefetch, поэтому временный файл у каждого свой
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(points)))
+        for point in points:
+            f.write(POINT.pack(*point))
+    os.replace(tmp_path, path)
+
+
+def calculate(image, source_hash, scale=1.0, algorithm=ALGORITHM, budget=MAX_POINTS):
+    """Хитбокс картинки: из кэша, а если его нет - обходом и в кэш"""
+    key = cache_key(source_hash, scale, algorithm, budget)
+    points = load(key)
+    if points is None:
+        points = simplify(algorithm.calculate(image), budget)
+        try:
+            store(key, points)
+        except OSError:
+            # Без кэша просто посчитаем заново в следующий раз
+            pass
+    return tuple(points)
+
+
+def rectangle(image):
+    """Хитбокс во всю картинку, без обхода - для спрайтов, чей хитбокс не нужен"""
+    half_w, half_h = image.width / 2, image.height / 2
+    return ((-half_w, -half_h), (half_w, -half_h), (half_w, half_h), (-half_w, half_h))
+
+
+def mirrored(points):
+    """Хитбокс картинки, отраженной по горизонтали"""
+    return tuple((-x, y) for x, y in reversed(points))
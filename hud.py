@@ -0,0 +1,41 @@
+"""
+Надписи интерфейса, которые живут между кадрами.
+
+Каждая надпись - arcade.Text в общем pyglet batch, и весь HUD рисуется
+одним batch.draw(). Текст заново форматируется и раскладывается только
+тогда, когда меняются значения, переданные в set().
+"""
+import arcade
+import pyglet
+
+
+class Hud:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        # имя -> (arcade.Text, строка формата)
+        self.labels = {}
+        # имя -> последние значения, из которых собран текст
+        self.values = {}
+
+    def add(self, name, fmt, x, y, color, font_size, *values, **kwargs):
+        """Новая надпись; fmt - строка для str.format"""
+        text = arcade.Text(fmt.format(*values), x, y, color, font_size,
+                           batch=self.batch, **kwargs)
+        self.labels[name] = (text, fmt)
+        self.values[name] = values
+        return text
+
+    def set(self, name, *values):
+        if self.values[name] == values:
+            return
+        self.values[name] = values
+        text, fmt = self.labels[name]
+        text.text = fmt.format(*values)
+
+    def show(self, name, visible=True):
+        text = self.labels[name][0]
+        if text.visible != visible:
+            text.visible = visible
+
+    def draw(self):
+        self.batch.draw()
@@ -0,0 +1,260 @@
+"""
+Таблица рекордов обеих игр.
+
+Результаты лежат в SQLite (saves/leaderboard.db) в одной таблице runs:
+игра, уровень, имя, результат и время записи. Уровень 0 - вся игра, у
+игры на память уровень - размер поля rows * 100 + cols, чтобы поля разного
+размера не мешались в одной таблице. Меньший результат лучше: секунды в
+платформере, попытки в игре на память.
+Индекс (game, level, score) отдает лучшие результаты по порядку без
+сортировки. Следующая страница продолжается от последней строки прошлой,
+а не через OFFSET, так что любая страница - это спуск по индексу, даже
+когда записей миллионы.
+
+COUNT(*) по индексу все равно перебирает строки, поэтому место нового
+результата считает дерево Фенвика по корзинам результата (RESOLUTION).
+Дерево строится одним проходом по индексу при первом обращении к таблице
+игры и уровня, дальше место и добавление стоят O(log n). Результаты из
+одной корзины делят место. Записи, которые другой процесс добавит после
+постройки дерева, в месте не учитываются до перезапуска.
+
+База в режиме WAL, а пишет в нее фоновый поток LeaderboardService: кадр
+только ставит результат в очередь, поток забирает всё накопившееся,
+вставляет одной транзакцией и заполняет Result местом и верхом таблицы.
+"""
+import atexit
+import getpass
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from savegame import SAVE_DIR
+
+DB_PATH = os.path.join(SAVE_DIR, "leaderboard.db")
+
+# игра -> (ширина корзины, число корзин); что дальше - в последней корзине
+RESOLUTION = {
+    # до часа с точностью до десятой секунды, как на экране
+    "frog": (0.1, 36000),
+    "memory": (1, 10000),
+}
+DEFAULT_RESOLUTION = (1, 100000)
+
+BATCH_SIZE = 256
+TOP_ROWS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    score REAL NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_board ON runs (game, level, score);
+"""
+
+COLUMNS = "id, name, score, created"
+
+
+def player_name():
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        return "Игрок"
+
+
+class Fenwick:
+    """Сумма на префиксе и прибавление к ячейке за O(log n)"""
+
+    def __init__(self, counts):
+        # Постройка за O(n): каждая ячейка добавляет свою сумму родителю
+        tree = [0] + list(counts)
+        size = len(counts)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.total = sum(counts)
+
+    def add(self, index, delta=1):
+        tree = self.tree
+        index += 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+        self.total += delta
+
+    def prefix(self, index):
+        """Сумма ячеек [0, index)"""
+        tree = self.tree
+        result = 0
+        while index > 0:
+            result += tree[index]
+            index -= index & -index
+        return result
+
+
+class Board:
+    """Сколько результатов в каждой корзине у одной игры и уровня"""
+
+    def __init__(self, width, size, counts):
+        self.width = width
+        self.size = size
+        self.tree = Fenwick(counts)
+
+    def bucket(self, score):
+        # То же деление, что CAST(score / width AS INTEGER) в Leaderboard.board
+        return min(max(int(score / self.width), 0), self.size - 1)
+
+    def add(self, score):
+        self.tree.add(self.bucket(score))
+
+    def rank(self, score):
+        """1 + сколько результатов строго лучше"""
+        return self.tree.prefix(self.bucket(score)) + 1
+
+
+class Leaderboard:
+    """Таблица рекордов на одном соединении; пользоваться из одного потока"""
+
+    def __init__(self, path=DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # С WAL это не портит базу при сбое, теряются разве что последние записи
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # (игра, уровень) -> Board
+        self.boards = {}
+
+    def close(self):
+        self.db.close()
+
+    def board(self, game, level):
+        board = self.boards.get((game, level))
+        if board is None:
+            width, size = RESOLUTION.get(game, DEFAULT_RESOLUTION)
+            counts = [0] * size
+            rows = self.db.execute(
+                "SELECT CAST(score / ? AS INTEGER), COUNT(*) FROM runs"
+                " WHERE game = ? AND level = ? GROUP BY 1", (width, game, level))
+            for bucket, count in rows:
+                counts[min(max(bucket, 0), size - 1)] += count
+            board = self.boards[(game, level)] = Board(width, size, counts)
+        return board
+
+    def add(self, runs):
+        """runs - список (игра, уровень, имя, результат), пишется одной транзакцией"""
+        created = time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO runs (game, level, name, score, created) VALUES (?, ?, ?, ?, ?)",
+                [(game, level, name, score, created) for game, level, name, score in runs])
+        # Еще не построенные деревья и так прочитают эти строки из базы
+        for game, level, _, score in runs:
+            board = self.boards.get((game, level))
+            if board is not None:
+                board.add(score)
+
+    def rank(self, game, level, score):
+        """(место результата score, сколько всего результатов)"""
+        board = self.board(game, level)
+        return board.rank(score), board.tree.total
+
+    def top(self, game, level=0, limit=TOP_ROWS, after=None):
+        """
+        Лучшие результаты, строки (id, имя, результат, время записи).
+        after - последняя строка прошлой страницы, с нее продолжается эта
+        """
+        if after is None:
+            return self.db.execute(
+                f"SELECT {COLUMNS} FROM runs WHERE game = ? AND level = ?"
+                " ORDER BY score, id LIMIT ?", (game, level, limit)).fetchall()
+        last_id, _, last_score, _ = after
+        return self.db.execute(
+            f"SELECT {COLUMNS} FROM runs WHERE game = ? AND level = ?"
+            " AND (score, id) > (?, ?) ORDER BY score, id LIMIT ?",
+            (game, level, last_score, last_id, limit)).fetchall()
+
+    def best(self, game, level=0):
+        rows = self.top(game, level, 1)
+        return rows[0] if rows else None
+
+
+class Result:
+    """Ответ на submit(); rank, total и top заполнены, когда done установлен"""
+
+    def __init__(self, game, level, name, score, top_rows):
+        self.run = (game, level, name, score)
+        self.top_rows = top_rows
+        self.rank = self.total = None
+        self.top = []
+        self.error = None
+        self.done = threading.Event()
+
+
+class LeaderboardService:
+    """Пишет результаты в фоновом потоке, до BATCH_SIZE за транзакцию"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, game, level, score, name=None, top_rows=TOP_ROWS):
+        result = Result(game, level, name or player_name(), score, top_rows)
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="leaderboard", daemon=True)
+                self.thread.start()
+        self.queue.put(result)
+        return result
+
+    def _run(self):
+        # Соединение SQLite живет в том потоке, где открыто
+        board = None
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if board is None:
+                    board = Leaderboard(self.path)
+                board.add([result.run for result in batch])
+                for result in batch:
+                    game, level, _, score = result.run
+                    result.rank, result.total = board.rank(game, level, score)
+                    result.top = board.top(game, level, result.top_rows)
+            except Exception as e:
+                # Поток должен пережить любую ошибку, иначе submit() и flush() не дождутся
+                for result in batch:
+                    result.error = f"Таблица рекордов недоступна: {e}"
+                if board is not None:
+                    # Деревья могли обновиться наполовину, их перестроит следующий запрос
+                    board.boards.clear()
+            finally:
+                for result in batch:
+                    result.done.set()
+                    self.queue.task_done()
+
+    def flush(self):
+        """Ждет, пока всё поставленное в очередь окажется в базе"""
+        self.queue.join()
+
+
+service = LeaderboardService()
+atexit.register(service.flush)
+
+
+def submit(game, level, score, name=None, top_rows=TOP_ROWS):
+    return service.submit(game, level, score, name, top_rows)
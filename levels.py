@@ -0,0 +1,312 @@
+"""
+Уровни платформера.
+
+Уровни описаны в maps/level{n}.json или нарисованы в Tiled
+(maps/level{n}.tmx, .tmj или .json в формате Tiled, см. tiled.py). При
+первой загрузке описание компилируется в двоичный кэш
+.cache/levels/<хэш>.lvl, где уже посчитаны позиции, масштабы, хитбоксы и
+размеры всех тел. Ключ кэша - хэш байтов файла уровня и способа расчета
+хитбоксов, сам файл при этом не разбирается. Остальное, от чего зависит
+результат (тайлсеты Tiled, текстуры тел), записано в кэш с отметками
+asset_stamp и сверяется при чтении, так что правка любого из них сама
+пересобирает кэш. Повторная загрузка - это чтение одного файла через mmap
+и несколько stat, импорт Tiled запускается только при промахе.
+
+Кроме тел с картинками в описании могут быть:
+    "tiles"      тайлы, которые только рисуются
+    "colliders"  {"walls": [...], "lava": [...]} - невидимые прямоугольники
+                 [left, bottom, right, top], с которыми сталкивается игрок
+"""
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+
+import tiled
+from assetpack import ASSET_DIR, asset_stamp
+
+MAPS_DIR = os.path.join(ASSET_DIR, "maps")
+CACHE_DIR = os.path.join(ASSET_DIR, ".cache", "levels")
+
+PLAYER_TEXTURE = "frogg/frog1.png"
+PLAYER_SCALING = 0.20
+
+
+# В таком порядке ищется файл уровня, если их несколько
+LEVEL_EXTENSIONS = (".json", ".tmj", ".tmx")
+
+
+def _level_numbers():
+    numbers = set()
+    for path in glob.glob(os.path.join(MAPS_DIR, "level*")):
+        match = re.fullmatch(r"level(\d+)(\.\w+)", os.path.basename(path))
+        if match and match.group(2) in LEVEL_EXTENSIONS:
+            numbers.add(int(match.group(1)))
+    return sorted(numbers)
+
+
+LEVEL_NUMBERS = _level_numbers()
+LAST_LEVEL = max(LEVEL_NUMBERS)
+
+# Уровень, куда отправляет лава
+LAVA_RESPAWN_LEVEL = 1
+
+
+# Виды записей в скомпилированном уровне
+WALL, LAVA, COIN, PORTAL, ENEMY, PLAYER, TILE = range(7)
+
+MAGIC = b"FLVL"
+VERSION = 3
+# magic, версия, зависимостей, строк, записей, фон, включенный портал, монета
+HEADER = struct.Struct("<4sHHHHhhh")
+STRING_LEN = struct.Struct("<H")
+# Зависимость: вид u8, затем имя и отметка строками
+DEP_KIND = struct.Struct("<B")
+# файл на диске (путь от ASSET_DIR) или ресурс через assetpack
+DEP_FILE, DEP_ASSET = 0, 1
+# вид, текстура (-1 у невидимых), x, y, масштаб, хитбокс (l, b, r, t),
+# ширина, высота, доп. a, b
+RECORD = struct.Struct("<Bh11d")
+
+
+def level_path(number):
+    for extension in LEVEL_EXTENSIONS:
+        path = os.path.join(MAPS_DIR, f"level{number}{extension}")
+        if os.path.isfile(path):
+            return path
+    return os.path.join(MAPS_DIR, f"level{number}.json")
+
+
+def read_spec(path):
+    """Описание уровня и список файлов, из которых оно собрано"""
+    if not path.endswith(".tmx"):
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        if not tiled.is_tiled_map(spec):
+            return spec, [path]
+    return tiled.load_map(path)
+
+
+class CompiledLevel:
+    """Уровень после компиляции: строки и записи тел"""
+
+    def __init__(self, background, portal_active_texture, coin_texture, records,
+                 dependencies=()):
+        self.background = background
+        self.portal_active_texture = portal_active_texture
+        self.coin_texture = coin_texture
+        # (вид, текстура, x, y, масштаб, хитбокс, размер, доп.)
+        self.records = records
+        # (вид, имя, отметка) на момент компиляции
+        self.dependencies = dependencies
+
+    def of_kind(self, kind):
+        return [r for r in self.records if r[0] == kind]
+
+    def textures(self):
+        textures = {r[1] for r in self.records if r[1] is not None}
+        textures.add(self.portal_active_texture)
+        if self.background:
+            textures.add(self.background)
+        return sorted(textures)
+
+
+def _spec_bodies(spec):
+    """(вид, текстура, x, y, масштаб, доп.) для всех тел из описания"""
+    for w in spec["walls"]:
+        yield WALL, w["texture"], w["x"], w["y"], w["scale"], (0, 0)
+    for w in spec.get("tiles", []):
+        yield TILE, w["texture"], w["x"], w["y"], w["scale"], (0, 0)
+    for w in spec.get("lava", []):
+        yield LAVA, w["texture"], w["x"], w["y"], w["scale"], (0, 0)
+    coins = spec.get("coins")
+    if coins:
+        for x, y in coins["positions"]:
+            yield COIN, coins["texture"], x, y, coins["scale"], (0, 0)
+    portal = spec["portal"]
+    yield PORTAL, portal["texture"], portal["x"], portal["y"], portal["scale"], (0, 0)
+    enemies = spec.get("enemies")
+    if enemies:
+        for start_x, end_x, y in enemies["patrols"]:
+            yield ENEMY, enemies["texture"], start_x, y, enemies["scale"], (start_x, end_x)
+    x, y = spec["player_start"]
+    yield PLAYER, PLAYER_TEXTURE, x, y, PLAYER_SCALING, (0, 0)
+
+
+def _spec_colliders(spec):
+    """(вид, left, bottom, right, top) невидимых тел"""
+    colliders = spec.get("colliders", {})
+    for kind, name in ((WALL, "walls"), (LAVA, "lava")):
+        for left, bottom, right, top in colliders.get(name, []):
+            yield kind, left, bottom, right, top
+
+
+def _stamp(kind, name):
+    if kind == DEP_ASSET:
+        return asset_stamp(name)
+    try:
+        st = os.stat(os.path.join(ASSET_DIR, name))
+    except OSError:
+        return "missing"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def cache_key(number, geometry):
+    """Ключ кэша по байтам файла уровня, без его разбора"""
+    path = level_path(number)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"v{VERSION}:{os.path.basename(path)}:"
+                  f"{getattr(geometry, '__name__', repr(geometry))}".encode())
+    # у AssetManager.geometry хитбоксы зависят от подключенных атласов
+    owner = getattr(geometry, "__self__", None)
+    digest.update(getattr(owner, "geometry_tag", "").encode())
+    return digest.hexdigest()
+
+
+def spec_dependencies(spec, sources, path):
+    """(вид, имя) всего, кроме самого файла path, из чего собирается уровень"""
+    dependencies = [(DEP_FILE, os.path.relpath(source, ASSET_DIR))
+                    for source in sources if os.path.abspath(source) != os.path.abspath(path)]
+    dependencies += [(DEP_ASSET, texture)
+                     for texture in sorted({body[1] for body in _spec_bodies(spec)})]
+    return dependencies
+
+
+def level_textures(number, geometry=None):
+    """
+    Все текстуры, которые понадобятся уровню. С geometry список берется из
+    готового кэша, если он есть, без разбора описания уровня
+    """
+    if geometry is not None:
+        level = _read_cache(number, geometry)
+        if level is not None:
+            return level.textures()
+    spec, _ = read_spec(level_path(number))
+    textures = {body[1] for body in _spec_bodies(spec)}
+    textures.add(spec["portal"]["active_texture"])
+    if spec.get("background"):
+        textures.add(spec["background"])
+    return sorted(textures)
+
+
+def compile_level(spec, geometry, dependencies=()):
+    """Описание уровня -> байты кэша; dependencies - (вид, имя) для сверки при чтении"""
+    strings = []
+    index = {}
+
+    def intern(text):
+        if text is None:
+            return -1
+        if text not in index:
+            index[text] = len(strings)
+            strings.append(text)
+        return index[text]
+
+    coins = spec.get("coins")
+    background = intern(spec.get("background"))
+    portal_on = intern(spec["portal"]["active_texture"])
+    coin = intern(coins["texture"] if coins else None)
+
+    records = []
+    for kind, texture, x, y, scale, extra in _spec_bodies(spec):
+        box, (width, height) = geometry(texture, scale)
+        records.append(RECORD.pack(kind, intern(texture), x, y, scale,
+                                   *box, width, height, *extra))
+    for kind, left, bottom, right, top in _spec_colliders(spec):
+        half_w, half_h = (right - left) / 2, (top - bottom) / 2
+        records.append(RECORD.pack(kind, -1, left + half_w, bottom + half_h, 1.0,
+                                   -half_w, -half_h, half_w, half_h,
+                                   right - left, top - bottom, 0, 0))
+
+    header = HEADER.pack(MAGIC, VERSION, len(dependencies), len(strings), len(records),
+                         background, portal_on, coin)
+    parts = [header]
+
+    def add_string(text):
+        data = text.encode("utf-8")
+        parts.append(STRING_LEN.pack(len(data)))
+        parts.append(data)
+
+    for kind, name in dependencies:
+        parts.append(DEP_KIND.pack(kind))
+        add_string(name)
+        add_string(_stamp(kind, name))
+    for text in strings:
+        add_string(text)
+    parts.extend(records)
+    return b"".join(parts)
+
+
+def parse_level(buffer):
+    magic, version, n_deps, n_strings, n_records, bg, portal_on, coin = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Неверный формат кэша уровня")
+    offset = HEADER.size
+
+    def read_string():
+        nonlocal offset
+        (length,) = STRING_LEN.unpack_from(buffer, offset)
+        offset += STRING_LEN.size
+        text = buffer[offset:offset + length].decode("utf-8")
+        offset += length
+        return text
+
+    dependencies = []
+    for _ in range(n_deps):
+        (kind,) = DEP_KIND.unpack_from(buffer, offset)
+        offset += DEP_KIND.size
+        dependencies.append((kind, read_string(), read_string()))
+    strings = [read_string() for _ in range(n_strings)]
+
+    def string(i):
+        return strings[i] if i >= 0 else None
+
+    records = []
+    for _ in range(n_records):
+        kind, tex, x, y, scale, l, b, r, t, w, h, a, e = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        records.append((kind, string(tex), x, y, scale, (l, b, r, t), (w, h), (a, e)))
+
+    return CompiledLevel(string(bg), string(portal_on), string(coin), records, dependencies)
+
+
+def _cache_path(number, geometry):
+    return os.path.join(CACHE_DIR, f"{cache_key(number, geometry)}.lvl")
+
+
+def _read_cache(number, geometry):
+    """Скомпилированный уровень, если кэш есть и ни одна зависимость не менялась"""
+    try:
+        with open(_cache_path(number, geometry), "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            level = parse_level(mm)
+    except (OSError, ValueError, struct.error):
+        return None
+    for kind, name, stamp in level.dependencies:
+        if _stamp(kind, name) != stamp:
+            return None
+    return level
+
+
+def load_level(number, geometry):
+    """Уровень из кэша, при необходимости сначала компилирует его"""
+    level = _read_cache(number, geometry)
+    if level is not None:
+        return level
+
+    source = level_path(number)
+    spec, sources = read_spec(source)
+    data = compile_level(spec, geometry, spec_dependencies(spec, sources, source))
+    path = _cache_path(number, geometry)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return parse_level(data)
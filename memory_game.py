@@ -2,10 +2,13 @@ import arcade
 import random
 import os
 import time
-import subprocess
-import sys
 from collections import deque
 
+import leaderboard
+from assets import assets
+from router import go
+from ui import Panel
+
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -15,86 +18,46 @@ CARD_WIDTH = 100
 CARD_HEIGHT = 150
 CARD_SPACING = 20
 CARD_SCALE = 0.1
+# Сколько разных картинок карточек есть (card1.png ... card6.png)
+CARD_TYPES = 6
+BACK_IMAGE = "back.png"
 
 
 
-class Button:
-    def __init__(self, text, x, y, width, height, color):
-        self.text = text
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.color = color
-        self.is_hovered = False
-        
-    def contains_point(self, x, y):
-        return (self.x - self.width/2 <= x <= self.x + self.width/2 and
-                self.y - self.height/2 <= y <= self.y + self.height/2)
-    
-    def update_hover(self, mouse_x, mouse_y):
-        self.is_hovered = self.contains_point(mouse_x, mouse_y)
-    
-    def draw(self):
-        
-        if self.is_hovered:
-            draw_color = tuple(min(255, c + 50) for c in self.color[:3])
-            border_color = arcade.color.YELLOW
-        else:
-            draw_color = self.color[:3]
-            border_color = arcade.color.WHITE
-        
-        left = self.x - self.width/2
-        right = self.x + self.width/2
-        top = self.y + self.height/2
-        bottom = self.y - self.height/2
-        
-        arcade.draw_triangle_filled(
-            left, bottom,
-            right, bottom,
-            left, top,
-            draw_color
-        )
-        arcade.draw_triangle_filled(
-            right, bottom,
-            right, top,
-            left, top,
-            draw_color
-        )
-        
-        arcade.draw_line(left, top, right, top, border_color, 3)
-        arcade.draw_line(left, bottom, right, bottom, border_color, 3)
-        arcade.draw_line(left, bottom, left, top, border_color, 3)
-        arcade.draw_line(right, bottom, right, top, border_color, 3)
-        
-        arcade.draw_text(
-            self.text,
-            self.x,
-            self.y,
-            arcade.color.WHITE,
-            font_size=16,
-            anchor_x="center",
-            anchor_y="center"
-        )
+_card_faces = None
+
+
+def card_faces():
+    """
+    Текстуры карточек, одни на весь процесс: [0] - рубашка, [i] - card{i}.png.
+    Список держит ссылки сам, поэтому вытеснение из кэша ресурсов ему не грозит.
+    """
+    global _card_faces
+    if _card_faces is None:
+        # Клик ищет карточку по сетке, хитбоксы карточек не нужны
+        _card_faces = [assets.texture(BACK_IMAGE, hit_box=False)]
+        _card_faces += [assets.texture(f"card{i}.png", hit_box=False)
+                        for i in range(1, CARD_TYPES + 1)]
+    return _card_faces
 
 
 # СПРАЙТЫ И КОЛЛИЗИИ 
 class Card(arcade.Sprite):
-    def __init__(self, image_type, back_image, scale=1):
-        self.front_image = f"card{image_type}.png"
-        super().__init__(self.front_image, scale, hit_box_algorithm="None")
+    def __init__(self, image_type, scale=1):
+        # Карточка создается рубашкой вверх
+        super().__init__(card_faces()[0], scale / assets.texture_scale(BACK_IMAGE),
+                         hit_box_algorithm="None")
         
-        self.back_image = back_image
         self.image_type = image_type
         self.is_face_up = False
         self.locked = False
 
     def turn_face_down(self):
-        self.texture = arcade.load_texture(self.back_image)
+        self.texture = card_faces()[0]
         self.is_face_up = False
 
     def turn_face_up(self):
-        self.texture = arcade.load_texture(self.front_image)
+        self.texture = card_faces()[self.image_type]
         self.is_face_up = True
 
     def on_click(self):
@@ -106,42 +69,27 @@ class Card(arcade.Sprite):
 
 
 
+def board_level(rows, cols):
+    """Уровень в таблице рекордов: у каждого размера поля своя таблица"""
+    return rows * 100 + cols
+
+
 class GameCompleteView(arcade.View):
-    def __init__(self, attempts):
+    def __init__(self, attempts, rows=GRID_ROWS, cols=GRID_COLS):
         super().__init__()
         self.attempts = attempts
+        self.rows = rows
+        self.cols = cols
+        # Место в таблице рекордов посчитает фоновый поток
+        self.result = leaderboard.submit("memory", board_level(rows, cols), attempts,
+                                         top_rows=1)
         
         
-        self.buttons = []
+        self.panel = Panel()
         button_width = 200
         button_height = 50
         
-        self.buttons.append(Button(
-            "Играть заново", 
-            SCREEN_WIDTH // 2 - 120, 
-            SCREEN_HEIGHT // 2 - 50, 
-            button_width, 
-            button_height, 
-            (50, 150, 50, 255)
-        ))
-        
-        self.buttons.append(Button(
-            "Главное меню", 
-            SCREEN_WIDTH // 2 + 120, 
-            SCREEN_HEIGHT // 2 - 50, 
-            button_width, 
-            button_height, 
-            (150, 50, 150, 255)
-        ))
-
-    def on_show_view(self):
-        arcade.set_background_color((20, 50, 20))
-
-    def on_draw(self):
-        self.clear()
-        
-        
-        arcade.draw_text(
+        self.panel.add_label(
             "ПОЗДРАВЛЯЕМ!", 
             SCREEN_WIDTH // 2, 
             SCREEN_HEIGHT // 2 + 100, 
@@ -150,7 +98,7 @@ class GameCompleteView(arcade.View):
             anchor_x="center"
         )
         
-        arcade.draw_text(
+        self.panel.add_label(
             "Вы успешно собрали все пары!", 
             SCREEN_WIDTH // 2, 
             SCREEN_HEIGHT // 2 + 50, 
@@ -159,7 +107,7 @@ class GameCompleteView(arcade.View):
             anchor_x="center"
         )
         
-        arcade.draw_text(
+        self.panel.add_label(
             f"Количество попыток: {self.attempts}", 
             SCREEN_WIDTH // 2, 
             SCREEN_HEIGHT // 2 + 20, 
@@ -168,9 +116,8 @@ class GameCompleteView(arcade.View):
             anchor_x="center"
         )
         
-        
         if self.attempts <= 8:
-            arcade.draw_text(
+            self.panel.add_label(
                 "🏆 ПРЕВОСХОДНО! 🏆", 
                 SCREEN_WIDTH // 2, 
                 SCREEN_HEIGHT // 2 - 10, 
@@ -179,7 +126,7 @@ class GameCompleteView(arcade.View):
                 anchor_x="center"
             )
         elif self.attempts <= 12:
-            arcade.draw_text(
+            self.panel.add_label(
                 "⭐ ОТЛИЧНО! ⭐", 
                 SCREEN_WIDTH // 2, 
                 SCREEN_HEIGHT // 2 - 10, 
@@ -188,7 +135,7 @@ class GameCompleteView(arcade.View):
                 anchor_x="center"
             )
         elif self.attempts <= 16:
-            arcade.draw_text(
+            self.panel.add_label(
                 "✓ Хорошо!", 
                 SCREEN_WIDTH // 2, 
                 SCREEN_HEIGHT // 2 - 10, 
@@ -197,49 +144,83 @@ class GameCompleteView(arcade.View):
                 anchor_x="center"
             )
         
-        for button in self.buttons:
-            button.draw()
+        self.panel.add_button(
+            "Играть заново", 
+            SCREEN_WIDTH // 2 - 120, 
+            SCREEN_HEIGHT // 2 - 50, 
+            button_width, 
+            button_height, 
+            (50, 150, 50, 255),
+            self.play_again
+        )
+        
+        self.panel.add_button(
+            "Главное меню", 
+            SCREEN_WIDTH // 2 + 120, 
+            SCREEN_HEIGHT // 2 - 50, 
+            button_width, 
+            button_height, 
+            (150, 50, 150, 255),
+            self.return_to_menu
+        )
+        
+        self.rank_label = self.panel.add_label(
+            "Записываем результат...", 
+            SCREEN_WIDTH // 2, 
+            SCREEN_HEIGHT // 2 - 110, 
+            arcade.color.WHITE, 
+            font_size=16, 
+            anchor_x="center"
+        )
         
-        arcade.draw_text(
+        self.panel.add_label(
             "Нажмите ESC для возврата в главное меню или R для новой игры", 
             SCREEN_WIDTH // 2, 
-            SCREEN_HEIGHT // 2 - 120, 
+            SCREEN_HEIGHT // 2 - 150, 
             arcade.color.LIGHT_GRAY, 
             font_size=14, 
             anchor_x="center"
         )
 
+    def on_show_view(self):
+        arcade.set_background_color((20, 50, 20))
+
+    def on_draw(self):
+        self.clear()
+        self.panel.draw()
+
+    def on_update(self, delta_time):
+        if self.result and self.result.done.is_set():
+            self.show_result(self.result)
+            self.result = None
+
+    def show_result(self, result):
+        if result.error:
+            self.rank_label.text = result.error
+            return
+        _, _, best, _ = result.top[0]
+        self.rank_label.text = (f"Место в таблице рекордов: {result.rank} из {result.total}, "
+                                f"рекорд - {best:.0f} попыток")
+
     def on_mouse_motion(self, x, y, dx, dy):
-        
-        for button in self.buttons:
-            button.update_hover(x, y)
+        self.panel.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        
-        for btn in self.buttons:
-            if btn.contains_point(x, y):
-                if btn.text == "Играть заново":
-                    game_view = MemoryGameView()
-                    self.window.show_view(game_view)
-                elif btn.text == "Главное меню":
-                    self.return_to_menu()
-                break
+        self.panel.on_mouse_press(x, y)
 
     def on_key_press(self, key, modifiers):
         # Управление клавиатурой
         if key == arcade.key.ESCAPE:
             self.return_to_menu()
         elif key == arcade.key.R:
-            game_view = MemoryGameView()
-            self.window.show_view(game_view)
+            self.play_again()
+
+    def play_again(self):
+        game_view = MemoryGameView(self.rows, self.cols)
+        self.window.show_view(game_view)
 
     def return_to_menu(self):
-        self.window.close()
-        try:
-            subprocess.call([sys.executable, "menu.py"])
-        except Exception as e:
-            print(f"Ошибка запуска меню: {e}")
-            sys.exit()
+        go(self.window, "menu")
 
 
 # МЕНЮ ПАУЗЫ 
@@ -249,71 +230,55 @@ class PauseMenuView(arcade.View):
         self.game_view = game_view
         
         
-        self.buttons = []
+        self.panel = Panel()
         button_width = 250
         button_height = 60
         button_spacing = 80
         center_x = SCREEN_WIDTH // 2
         start_y = SCREEN_HEIGHT // 2 + 50
         
-        self.buttons.append(Button(
+        self.panel.add_rectangle(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, (0, 0, 0, 128))
+        
+        self.panel.add_label(
+            "ПАУЗА", 
+            SCREEN_WIDTH // 2, 
+            SCREEN_HEIGHT // 2 + 150, 
+            arcade.color.WHITE, 
+            font_size=48, 
+            anchor_x="center"
+        )
+        
+        self.panel.add_button(
             "Продолжить игру", 
             center_x, 
             start_y, 
             button_width, 
             button_height, 
-            (50, 150, 50, 255)
-        ))
+            (50, 150, 50, 255),
+            self.resume
+        )
         
-        self.buttons.append(Button(
+        self.panel.add_button(
             "Новая игра", 
             center_x, 
             start_y - button_spacing, 
             button_width, 
             button_height, 
-            (200, 150, 50, 255)
-        ))
+            (200, 150, 50, 255),
+            self.new_game
+        )
         
-        self.buttons.append(Button(
+        self.panel.add_button(
             "Главное меню", 
             center_x, 
             start_y - button_spacing * 2, 
             button_width, 
             button_height, 
-            (150, 50, 150, 255)
-        ))
-
-    def on_show_view(self):
-        pass
-
-    def on_draw(self):
-        
-        arcade.draw_triangle_filled(
-            0, 0,
-            SCREEN_WIDTH, 0,
-            0, SCREEN_HEIGHT,
-            (0, 0, 0, 128)
-        )
-        arcade.draw_triangle_filled(
-            SCREEN_WIDTH, 0,
-            SCREEN_WIDTH, SCREEN_HEIGHT,
-            0, SCREEN_HEIGHT,
-            (0, 0, 0, 128)
+            (150, 50, 150, 255),
+            self.return_to_menu
         )
         
-        arcade.draw_text(
-            "ПАУЗА", 
-            SCREEN_WIDTH // 2, 
-            SCREEN_HEIGHT // 2 + 150, 
-            arcade.color.WHITE, 
-            font_size=48, 
-            anchor_x="center"
-        )
-        
-        for button in self.buttons:
-            button.draw()
-        
-        arcade.draw_text(
+        self.panel.add_label(
             "Нажмите ESC для возврата в игру", 
             SCREEN_WIDTH // 2, 
             SCREEN_HEIGHT // 2 - 200, 
@@ -322,54 +287,58 @@ class PauseMenuView(arcade.View):
             anchor_x="center"
         )
 
+    def on_show_view(self):
+        pass
+
+    def on_draw(self):
+        self.panel.draw()
+
     def on_mouse_motion(self, x, y, dx, dy):
-        
-        for button in self.buttons:
-            button.update_hover(x, y)
+        self.panel.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        # Обработка коллизий с кнопками
-        for btn in self.buttons:
-            if btn.contains_point(x, y):
-                if btn.text == "Продолжить игру":
-                    self.window.show_view(self.game_view)
-                elif btn.text == "Новая игра":
-                    
-                    if hasattr(self.game_view, 'music_player') and self.game_view.music_playing:
-                        self.game_view.stop_music()
-                    
-                    new_game_view = MemoryGameView()
-                    self.window.show_view(new_game_view)
-                elif btn.text == "Главное меню":
-                   
-                    if hasattr(self.game_view, 'music_player') and self.game_view.music_playing:
-                        self.game_view.stop_music()
-                    
-                    self.return_to_menu()
-                break
+        self.panel.on_mouse_press(x, y)
 
     def on_key_press(self, key, modifiers):
         # Управление клавиатурой
         if key == arcade.key.ESCAPE:
-            self.window.show_view(self.game_view)
+            self.resume()
+
+    def resume(self):
+        self.window.show_view(self.game_view)
+
+    def new_game(self):
+        if hasattr(self.game_view, 'music_player') and self.game_view.music_playing:
+            self.game_view.stop_music()
+        
+        new_game_view = MemoryGameView(self.game_view.rows, self.game_view.cols)
+        self.window.show_view(new_game_view)
 
     def return_to_menu(self):
-        self.window.close()
-        try:
-            subprocess.call([sys.executable, "menu.py"])
-        except Exception as e:
-            print(f"Ошибка запуска меню: {e}")
-            sys.exit()
+        if hasattr(self.game_view, 'music_player') and self.game_view.music_playing:
+            self.game_view.stop_music()
+        
+        go(self.window, "menu")
     
 
 # ОСНОВНАЯ ИГРА
 class MemoryGameView(arcade.View):
-    def __init__(self):
+    def __init__(self, rows=GRID_ROWS, cols=GRID_COLS, seed=None):
         super().__init__()
         
+        if rows * cols % 2:
+            raise ValueError(f"Поле {rows}x{cols}: нечетное число карточек")
+        self.rows = rows
+        self.cols = cols
+        # С одним seed раскладка карточек всегда одна и та же
+        self.random = random.Random(seed)
         
-        self.back_image = "back.png"
         self.card_list = None
+        # карточки по ячейкам: cards[row * cols + col]
+        self.cards = []
+        self.start_x = self.start_y = 0
+        self.pairs_found = 0
+        self.pairs_total = rows * cols // 2
         
         
         self.selected_cards = deque(maxlen=2)
@@ -383,7 +352,7 @@ class MemoryGameView(arcade.View):
         self.music_playing = False
         
         try:
-            self.background_music = arcade.load_sound("fonovaya-muzyika-dlya-detskoy-igrovoy-komnatyi-979.wav")
+            self.background_music = assets.sound("fonovaya-muzyika-dlya-detskoy-igrovoy-komnatyi-979.wav")
         except:
             print("Не удалось загрузить fonovaya-muzyika-dlya-detskoy-igrovoy-komnatyi-979.wav")
         
@@ -395,33 +364,45 @@ class MemoryGameView(arcade.View):
         self.game_state = "playing"
         self.selected_cards.clear()
         self.flip_timer = 0
+        self.pairs_found = 0
         
-        # Генерация карт и их расположение
-        card_types = list(range(1, 7)) * 2
-        random.shuffle(card_types)
+        # Генерация карт и их расположение; на больших полях картинки повторяются
+        card_types = [i % CARD_TYPES + 1 for i in range(self.pairs_total)] * 2
+        self.random.shuffle(card_types)
         
         
         self.card_list = arcade.SpriteList()
+        self.cards = []
         
         
-        start_x = (SCREEN_WIDTH - (GRID_COLS * (CARD_WIDTH + CARD_SPACING) - CARD_SPACING)) / 2
-        start_y = (SCREEN_HEIGHT - (GRID_ROWS * (CARD_HEIGHT + CARD_SPACING) - CARD_SPACING)) / 2
+        start_x = (SCREEN_WIDTH - (self.cols * (CARD_WIDTH + CARD_SPACING) - CARD_SPACING)) / 2
+        start_y = (SCREEN_HEIGHT - (self.rows * (CARD_HEIGHT + CARD_SPACING) - CARD_SPACING)) / 2
+        self.start_x, self.start_y = start_x, start_y
         
-        for row in range(GRID_ROWS):
-            for col in range(GRID_COLS):
-                card = Card(
-                    image_type=card_types.pop(),
-                    back_image=self.back_image,
-                    scale=CARD_SCALE
-                )
+        for row in range(self.rows):
+            for col in range(self.cols):
+                card = Card(image_type=card_types.pop(), scale=CARD_SCALE)
                 
                 card.center_x = start_x + col * (CARD_WIDTH + CARD_SPACING) + CARD_WIDTH/2
                 card.center_y = start_y + row * (CARD_HEIGHT + CARD_SPACING) + CARD_HEIGHT/2
                 
-                card.turn_face_down()
-                card.locked = False
-                
                 self.card_list.append(card)
+                self.cards.append(card)
+
+    def card_at(self, x, y):
+        """Карточка под точкой: ячейка считается по сетке, без перебора"""
+        col, dx = divmod(x - self.start_x, CARD_WIDTH + CARD_SPACING)
+        row, dy = divmod(y - self.start_y, CARD_HEIGHT + CARD_SPACING)
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return None
+        if dx > CARD_WIDTH or dy > CARD_HEIGHT:
+            # промежуток между карточками
+            return None
+        card = self.cards[int(row) * self.cols + int(col)]
+        # картинка меньше ячейки, попадать нужно в саму карточку
+        if card.left <= x <= card.right and card.bottom <= y <= card.top:
+            return card
+        return None
 
     def on_show_view(self):
         arcade.set_background_color(arcade.color.AMAZON)
@@ -472,9 +453,8 @@ class MemoryGameView(arcade.View):
     def on_mouse_press(self, x, y, button, modifiers):
         # обработка кликов по карточкам
         if self.game_state == "playing":
-            cards_clicked = arcade.get_sprites_at_point((x, y), self.card_list)
-            if cards_clicked:
-                card = cards_clicked[0]
+            card = self.card_at(x, y)
+            if card:
                 if card.on_click():
                     self.selected_cards.append(card)
                     self.check_card_pair()
@@ -489,12 +469,13 @@ class MemoryGameView(arcade.View):
                 card1.locked = True
                 card2.locked = True
                 self.selected_cards.clear()
+                self.pairs_found += 1
                 
                 # Проверка условия победы
-                if all(card.locked for card in self.card_list):
+                if self.pairs_found == self.pairs_total:
                     
                     self.stop_music()
-                    complete_view = GameCompleteView(self.attempts)
+                    complete_view = GameCompleteView(self.attempts, self.rows, self.cols)
                     self.window.show_view(complete_view)
             else:
                 
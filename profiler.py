@@ -0,0 +1,173 @@
+"""
+Покадровый профайлер по фазам.
+
+begin(phase) закрывает текущую фазу и открывает следующую, так что на
+границу фаз уходит один вызов perf_counter. Кадр - всё от begin_frame()
+до end_frame(); последние FRAME_HISTORY кадров лежат в кольцевом буфере.
+Фазы с одним именем внутри кадра (например, несколько тиков физики)
+складываются.
+
+Модуль не зависит от arcade: World получает профайлер параметром, а без
+него пользуется NULL_PROFILER, у которого все методы пустые.
+
+Записанное выгружается в Chrome trace (chrome://tracing, Perfetto) и в CSV.
+"""
+import csv
+import json
+import time
+from collections import deque
+
+
+FRAME_HISTORY = 600
+
+
+class Frame:
+    __slots__ = ("start", "end", "phases")
+
+    def __init__(self, start, end, phases):
+        self.start = start
+        self.end = end
+        # (имя, начало, конец) в порядке выполнения
+        self.phases = phases
+
+    @property
+    def work(self):
+        return self.end - self.start
+
+    def totals(self):
+        """имя фазы -> суммарное время за кадр"""
+        totals = {}
+        for name, start, end in self.phases:
+            totals[name] = totals.get(name, 0.0) + end - start
+        return totals
+
+
+def percentile(values, p):
+    """p-й перцентиль по ближайшему рангу"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class FrameProfiler:
+    def __init__(self, capacity=FRAME_HISTORY, clock=time.perf_counter):
+        self.clock = clock
+        self.frames = deque(maxlen=capacity)
+        self.frame_start = None
+        self.phases = None
+        self.phase = None
+        self.phase_start = 0.0
+
+    def begin_frame(self):
+        now = self.clock()
+        if self.phases is not None:
+            # Прошлый кадр не закрыли, например View сменился посреди кадра
+            self._finish(now)
+        self.frame_start = now
+        self.phases = []
+        self.phase = None
+
+    def begin(self, name):
+        if self.phases is None:
+            return
+        now = self.clock()
+        if self.phase is not None:
+            self.phases.append((self.phase, self.phase_start, now))
+        self.phase = name
+        self.phase_start = now
+
+    def end(self):
+        if self.phases is None or self.phase is None:
+            return
+        self.phases.append((self.phase, self.phase_start, self.clock()))
+        self.phase = None
+
+    def end_frame(self):
+        if self.phases is not None:
+            self._finish(self.clock())
+
+    def _finish(self, now):
+        if self.phase is not None:
+            self.phases.append((self.phase, self.phase_start, now))
+        self.frames.append(Frame(self.frame_start, now, self.phases))
+        self.phases = None
+        self.phase = None
+
+    def clear(self):
+        self.frames.clear()
+        self.phases = None
+        self.phase = None
+
+    # Статистика
+    def frame_times(self):
+        """Интервалы между началами соседних кадров, в секундах"""
+        starts = [frame.start for frame in self.frames]
+        return [b - a for a, b in zip(starts, starts[1:])]
+
+    def percentiles(self, ps=(50, 95, 99)):
+        times = self.frame_times()
+        return [percentile(times, p) for p in ps]
+
+    def phase_averages(self):
+        """имя фазы -> среднее время за кадр, по убыванию"""
+        totals = {}
+        for frame in self.frames:
+            for name, value in frame.totals().items():
+                totals[name] = totals.get(name, 0.0) + value
+        count = len(self.frames) or 1
+        return dict(sorted(((name, value / count) for name, value in totals.items()),
+                           key=lambda item: item[1], reverse=True))
+
+    # Выгрузка
+    def export_chrome_trace(self, path):
+        events = []
+        origin = self.frames[0].start if self.frames else 0.0
+        for number, frame in enumerate(self.frames):
+            events.append({"name": f"frame {number}", "cat": "frame", "ph": "X",
+                           "ts": (frame.start - origin) * 1e6, "dur": frame.work * 1e6,
+                           "pid": 1, "tid": 1})
+            for name, start, end in frame.phases:
+                events.append({"name": name, "cat": "phase", "ph": "X",
+                               "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6,
+                               "pid": 1, "tid": 1})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path):
+        names = list(self.phase_averages())
+        origin = self.frames[0].start if self.frames else 0.0
+        starts = [frame.start for frame in self.frames]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "start_ms", "frame_ms", "work_ms"] + names)
+            for number, frame in enumerate(self.frames):
+                # У последнего кадра следующего еще нет
+                interval = ""
+                if number + 1 < len(starts):
+                    interval = f"{(starts[number + 1] - frame.start) * 1000:.3f}"
+                totals = frame.totals()
+                writer.writerow(
+                    [number, f"{(frame.start - origin) * 1000:.3f}", interval,
+                     f"{frame.work * 1000:.3f}"]
+                    + [f"{totals.get(name, 0.0) * 1000:.3f}" for name in names])
+
+
+class NullProfiler:
+    """Профайлер, который ничего не записывает"""
+
+    def begin_frame(self):
+        pass
+
+    def begin(self, name):
+        pass
+
+    def end(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,196 @@
+"""
+Запись ввода платформера и ее прогон без окна.
+
+GameView с InputRecorder пишет каждое нажатие и отпускание как действие
+World ("left", "jump", ...) с номером тика, перед которым оно случилось.
+Симуляция детерминирована по тикам, поэтому тот же ввод дает то же
+состояние, и replay() просто гонит World.step() так быстро, как может.
+
+Формат .frec (little-endian):
+    заголовок   magic "FREC", версия u16, стартовый уровень u16,
+                длина метки геометрии u16, метка (utf-8)
+    события     число u32, затем (тик u32, тип u8, действие u8)
+    итог        тик u32, уровень u16, монеты u16, x f64, y f64,
+                смертей u32, пройдена ли игра u8
+
+Метка геометрии - assets.geometry_tag в момент записи: с атласами
+хитбоксы чуть другие, и запись проигрывается только с той же геометрией.
+
+    python replay.py run.frec [еще.frec ...]   # проиграть и сверить итог
+    python replay.py run.frec --repeat 20      # нагрузка для профайлера
+    python replay.py                           # все записи из replays/
+
+Записи в replays/ - регрессионная проверка физики: после изменений в
+simulation.py они должны сходиться, иначе код выхода 1. Если поведение
+меняется намеренно, запись перезаписывается вместе с изменением.
+"""
+import argparse
+import glob
+import os
+import struct
+import sys
+import time
+
+from assetpack import ASSET_DIR
+from profiler import NULL_PROFILER
+from simulation import World, image_geometry
+
+
+MAGIC = b"FREC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHH")
+COUNT = struct.Struct("<I")
+EVENT = struct.Struct("<IBB")
+FINAL = struct.Struct("<IHHddIB")
+
+ACTIONS = ("left", "right", "jump", "interact")
+PRESS, RELEASE = 0, 1
+
+REPLAY_DIR = os.path.join(ASSET_DIR, "replays")
+
+# Допуск при сверке позиции игрока
+POSITION_TOLERANCE = 1e-6
+
+
+class InputRecorder:
+    def __init__(self, path, level=1, geometry_tag=""):
+        self.path = path
+        self.level = level
+        self.geometry_tag = geometry_tag
+        self.events = bytearray()
+        self.count = 0
+
+    def _add(self, tick, kind, action):
+        self.events += EVENT.pack(tick, kind, ACTIONS.index(action))
+        self.count += 1
+
+    def press(self, tick, action):
+        self._add(tick, PRESS, action)
+
+    def release(self, tick, action):
+        self._add(tick, RELEASE, action)
+
+    def save(self, world):
+        """Пишет запись целиком вместе с текущим состоянием world как итогом"""
+        tag = self.geometry_tag.encode("utf-8")
+        player = world.player
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.level, len(tag)))
+            f.write(tag)
+            f.write(COUNT.pack(self.count))
+            f.write(self.events)
+            f.write(FINAL.pack(world.ticks, world.level, world.coin_count,
+                               player.center_x, player.center_y, world.deaths,
+                               world.completed))
+        os.replace(tmp_path, self.path)
+
+
+class Recording:
+    def __init__(self, level, geometry_tag, events, final):
+        self.level = level
+        self.geometry_tag = geometry_tag
+        # (тик, тип, действие) по порядку
+        self.events = events
+        # ожидаемое состояние в конце
+        self.final = final
+
+
+def load_recording(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, level, tag_len = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: не запись ввода или другая версия")
+    offset = HEADER.size
+    tag = data[offset:offset + tag_len].decode("utf-8")
+    offset += tag_len
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    events = [(tick, kind, ACTIONS[action])
+              for tick, kind, action in EVENT.iter_unpack(data[offset:offset + count * EVENT.size])]
+    offset += count * EVENT.size
+    ticks, final_level, coins, x, y, deaths, completed = FINAL.unpack_from(data, offset)
+    final = {"ticks": ticks, "level": final_level, "coins": coins, "x": x, "y": y,
+             "deaths": deaths, "completed": bool(completed)}
+    return Recording(level, tag, events, final)
+
+
+def geometry_for(recording):
+    if not recording.geometry_tag:
+        return image_geometry
+    # Запись сделана с атласами: нужна та же геометрия, что и в игре
+    from assets import assets
+    if assets.geometry_tag != recording.geometry_tag:
+        raise ValueError("запись сделана с другим набором атласов")
+    return assets.geometry
+
+
+def replay(recording, geometry=None, profiler=NULL_PROFILER):
+    """Прогоняет запись и возвращает World в конечном состоянии"""
+    world = World(recording.level, geometry or geometry_for(recording), profiler)
+    events = recording.events
+    index = 0
+    end = recording.final["ticks"]
+    while True:
+        # Ввод применяется между тиками, как в GameView
+        while index < len(events) and events[index][0] == world.ticks:
+            _, kind, action = events[index]
+            if kind == PRESS:
+                world.press(action)
+            else:
+                world.release(action)
+            index += 1
+        world.events.clear()
+        if world.ticks >= end:
+            return world
+        world.step()
+
+
+def check(recording, world):
+    """Расхождения итога с записью, пустой список - всё совпало"""
+    final = recording.final
+    actual = {"ticks": world.ticks, "level": world.level, "coins": world.coin_count,
+              "x": world.player.center_x, "y": world.player.center_y,
+              "deaths": world.deaths, "completed": world.completed}
+    problems = []
+    for key, expected in final.items():
+        value = actual[key]
+        if key in ("x", "y"):
+            if abs(value - expected) > POSITION_TOLERANCE:
+                problems.append(f"{key}: {value} вместо {expected}")
+        elif value != expected:
+            problems.append(f"{key}: {value} вместо {expected}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Прогон записей ввода без окна")
+    parser.add_argument("paths", nargs="*", help="файлы .frec, по умолчанию все из replays/")
+    parser.add_argument("--repeat", type=int, default=1, help="сколько раз прогнать каждую")
+    args = parser.parse_args(argv)
+    paths = args.paths or sorted(glob.glob(os.path.join(REPLAY_DIR, "*.frec")))
+    if not paths:
+        print(f"Нет записей в {REPLAY_DIR}")
+        return 1
+
+    failed = 0
+    for path in paths:
+        recording = load_recording(path)
+        geometry = geometry_for(recording)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            world = replay(recording, geometry)
+        elapsed = time.perf_counter() - start
+        problems = check(recording, world)
+        rate = world.ticks * args.repeat / elapsed if elapsed else 0
+        status = "OK" if not problems else "РАСХОЖДЕНИЕ"
+        print(f"{path}: {status}, тиков {world.ticks}, {rate:.0f} тиков/с")
+        for problem in problems:
+            print(f"    {problem}")
+        failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Перемотка платформера назад.
+
+После каждого тика RewindBuffer.record() кладет снимок World (тот же, что
+пишет savegame.snapshot) в кольцевой буфер. Буфер состоит из отрезков по
+KEYFRAME_INTERVAL тиков: первый снимок отрезка хранится целиком - это
+опорный кадр, остальные - как XOR с ним. Между соседними тиками почти
+все байты снимка совпадают, так что XOR - это в основном нули.
+
+Пока отрезок пишется, разницы лежат как есть и тик стоит только снимка и
+XOR. Заполненный отрезок сжимается deflate одним вызовом, и от ~100 байт
+на тик остается единицы. Когда перемотка доходит до сжатого отрезка, он
+распаковывается обратно целиком.
+
+Самый старый отрезок выбрасывается, когда и без него остается
+REWIND_SECONDS кадров или буфер занимает больше MEMORY_BUDGET байт. Поэтому буфер
+можно держать включенным всегда.
+"""
+import zlib
+from collections import deque
+
+import savegame
+from simulation import SIMULATION_RATE
+
+REWIND_SECONDS = 300
+KEYFRAME_INTERVAL = 60
+MEMORY_BUDGET = 4 * 1024 * 1024
+COMPRESS_LEVEL = 6
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(len(a), "little")
+
+
+class Segment:
+    __slots__ = ("keyframe", "deltas", "packed", "count")
+
+    def __init__(self, keyframe):
+        self.keyframe = keyframe
+        # XOR с keyframe для следующих тиков, пока отрезок не сжат
+        self.deltas = []
+        self.packed = None
+        self.count = 1
+
+    @property
+    def nbytes(self):
+        if self.packed is not None:
+            return len(self.keyframe) + len(self.packed)
+        return len(self.keyframe) * self.count
+
+    def pack(self):
+        self.packed = zlib.compress(b"".join(self.deltas), COMPRESS_LEVEL)
+        self.deltas = None
+
+    def unpack(self):
+        data = zlib.decompress(self.packed)
+        size = len(self.keyframe)
+        self.deltas = [data[i:i + size] for i in range(0, len(data), size)]
+        self.packed = None
+
+
+class RewindBuffer:
+    def __init__(self, seconds=REWIND_SECONDS, keyframe_interval=KEYFRAME_INTERVAL,
+                 budget=MEMORY_BUDGET):
+        self.capacity = seconds * SIMULATION_RATE
+        self.keyframe_interval = keyframe_interval
+        self.budget = budget
+        self.segments = deque()
+        self.frames = 0
+        # байты сжатых отрезков; открытый последний считается отдельно
+        self.packed_bytes = 0
+
+    def __len__(self):
+        return self.frames
+
+    @property
+    def nbytes(self):
+        tail = self.segments[-1].nbytes if self.segments else 0
+        return self.packed_bytes + tail
+
+    def clear(self):
+        self.segments.clear()
+        self.frames = 0
+        self.packed_bytes = 0
+
+    def record(self, world):
+        state = savegame.snapshot(world)
+        segment = self.segments[-1] if self.segments else None
+        if (segment is None or segment.count >= self.keyframe_interval
+                or len(state) != len(segment.keyframe)):
+            # Новый отрезок: пора или поменялся размер снимка (другой уровень)
+            if segment is not None:
+                segment.pack()
+                self.packed_bytes += segment.nbytes
+            self.segments.append(Segment(state))
+        else:
+            segment.deltas.append(_xor(state, segment.keyframe))
+            segment.count += 1
+        self.frames += 1
+
+        # Отрезок выбрасывается целиком, только если и без него хватает кадров
+        while len(self.segments) > 1 and (self.frames - self.segments[0].count >= self.capacity
+                                          or self.nbytes > self.budget):
+            old = self.segments.popleft()
+            self.frames -= old.count
+            self.packed_bytes -= old.nbytes
+
+    def latest(self):
+        """Байты последнего записанного снимка или None"""
+        if not self.segments:
+            return None
+        segment = self.segments[-1]
+        if not segment.deltas:
+            return segment.keyframe
+        return _xor(segment.deltas[-1], segment.keyframe)
+
+    def drop(self):
+        """Выбрасывает последний снимок"""
+        segment = self.segments[-1]
+        self.frames -= 1
+        if segment.count > 1:
+            segment.deltas.pop()
+            segment.count -= 1
+            return
+        self.segments.pop()
+        if self.segments:
+            # Предыдущий отрезок снова становится открытым
+            previous = self.segments[-1]
+            self.packed_bytes -= previous.nbytes
+            previous.unpack()
+
+    def step_back(self, world):
+        """
+        Возвращает world на тик назад. Последний снимок в буфере - текущее
+        состояние, он выбрасывается, и world встает в предыдущий. False,
+        если назад уже некуда.
+        """
+        if self.frames < 2:
+            return False
+        self.drop()
+        savegame.restore(world, self.latest())
+        return True
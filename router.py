@@ -0,0 +1,65 @@
+"""
+Переключение экранов внутри одного окна.
+
+Раньше меню и игры запускали друг друга отдельными процессами, и каждый
+переход стоил нового интерпретатора, окна и загрузки ресурсов. Теперь окно
+одно на весь процесс, а go(window, "menu") просто показывает нужный View;
+кэш ресурсов (assets) при этом остается прогретым.
+"""
+
+
+def _menu():
+    from menu import MenuView
+    return MenuView()
+
+
+def _platformer():
+    from game2 import GameView
+    return GameView()
+
+
+def _memory():
+    from memory_game import MemoryGameView
+    return MemoryGameView()
+
+
+# имя -> (фабрика, размер окна, заголовок, переиспользовать ли View)
+ROUTES = {
+    "menu": (_menu, (800, 600), "Игровое меню", True),
+    "platformer": (_platformer, (1280, 720), "Frog Adventures 2", False),
+    "memory": (_memory, (800, 600), "Memory Game", False),
+}
+
+
+class ViewRouter:
+    def __init__(self, window):
+        self.window = window
+        self.views = {}
+        self.current = None
+
+    def go(self, name):
+        factory, size, title, keep = ROUTES[name]
+        window = self.window
+        if tuple(window.get_size()) != size:
+            window.set_size(*size)
+        window.set_caption(title)
+
+        view = self.views.get(name)
+        if view is None:
+            view = factory()
+            if keep:
+                self.views[name] = view
+        self.current = name
+        window.show_view(view)
+        return view
+
+
+def get_router(window):
+    router = getattr(window, "router", None)
+    if router is None:
+        router = window.router = ViewRouter(window)
+    return router
+
+
+def go(window, name):
+    return get_router(window).go(name)
@@ -0,0 +1,197 @@
+"""
+Сохранения платформера.
+
+Снимок - всё изменяемое состояние World: уровень, тик, гибели, монеты,
+игрок, портал, какие монеты уже подобраны и где стоят враги. Стены и
+прочая неизменная часть уровня берутся из LevelTemplate, поэтому загрузка
+- это разбор пары сотен байт и World.enter(), без сборки уровня.
+
+Формат .sav (little-endian):
+    заголовок   magic "FSAV", версия u16, уровень u16
+    состояние   тик u32, смертей u32, монет u16, таймер перезапуска u16,
+                флаги u8, x, y, dx, dy игрока f64
+    уровень     число монет u16, число врагов u16,
+                битовая маска оставшихся монет,
+                для каждого врага x f64, y f64, направление i8, жив u8
+    crc32 u32 всего, что выше
+
+Запись идет в фоновом потоке SaveWriter: кадр только упаковывает снимок
+(микросекунды), а файл пишется через .tmp и os.replace, так что на диске
+всегда лежит либо старое, либо новое сохранение целиком. Ошибка записи
+не роняет поток, а остается в SaveWriter.error, ее показывает меню паузы.
+"""
+import atexit
+import os
+import queue
+import struct
+import threading
+import zlib
+
+from assetpack import ASSET_DIR
+from spatial import SpatialGrid
+
+SAVE_DIR = os.path.join(ASSET_DIR, "saves")
+SAVE_PATH = os.path.join(SAVE_DIR, "save.sav")
+CHECKPOINT_PATH = os.path.join(SAVE_DIR, "checkpoint.sav")
+
+MAGIC = b"FSAV"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+STATE = struct.Struct("<IIHHBdddd")
+COUNTS = struct.Struct("<HH")
+ENEMY = struct.Struct("<ddbB")
+CRC = struct.Struct("<I")
+
+ON_GROUND, DOUBLE_JUMPED, FACING_RIGHT, PORTAL_ACTIVE, COMPLETED = (1 << i for i in range(5))
+FLAGS = (("on_ground", ON_GROUND), ("double_jumped", DOUBLE_JUMPED),
+         ("facing_right", FACING_RIGHT), ("portal_active", PORTAL_ACTIVE),
+         ("completed", COMPLETED))
+
+
+def snapshot(world):
+    """Состояние world -> байты сохранения"""
+    flags = 0
+    for name, bit in FLAGS:
+        if getattr(world, name):
+            flags |= bit
+    player = world.player
+    parts = [HEADER.pack(MAGIC, VERSION, world.level),
+             STATE.pack(world.ticks, world.deaths, world.coin_count, world.restart_timer,
+                        flags, player.center_x, player.center_y, world.dx, world.dy)]
+
+    coins = world.template.coins
+    system = world.enemy_system
+    parts.append(COUNTS.pack(len(coins), len(system)))
+    mask = bytearray((len(coins) + 7) // 8)
+    present = set(map(id, world.coins))
+    for i, coin in enumerate(coins):
+        if id(coin) in present:
+            mask[i >> 3] |= 1 << (i & 7)
+    parts.append(bytes(mask))
+    for i in range(len(system)):
+        parts.append(ENEMY.pack(system.x[i], system.y[i], int(system.direction[i]),
+                                bool(system.alive[i])))
+
+    data = b"".join(parts)
+    return data + CRC.pack(zlib.crc32(data))
+
+
+def restore(world, data):
+    """Переводит world в сохраненное состояние; ValueError, если файл чужой"""
+    if len(data) < HEADER.size + CRC.size:
+        raise ValueError("Сохранение повреждено")
+    body, (crc,) = data[:-CRC.size], CRC.unpack_from(data, len(data) - CRC.size)
+    if zlib.crc32(body) != crc:
+        raise ValueError("Сохранение повреждено")
+    magic, version, level = HEADER.unpack_from(body, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Не сохранение или другая версия")
+    offset = HEADER.size
+    ticks, deaths, coin_count, restart_timer, flags, x, y, dx, dy = STATE.unpack_from(body, offset)
+    offset += STATE.size
+    n_coins, n_enemies = COUNTS.unpack_from(body, offset)
+    offset += COUNTS.size
+    mask = body[offset:offset + (n_coins + 7) // 8]
+    offset += len(mask)
+
+    template = world.template_for(level)
+    if n_coins != len(template.coins) or n_enemies != len(template.enemy_system):
+        raise ValueError("Сохранение сделано для другой версии уровня")
+
+    world.enter(level)
+    coins = template.coins
+    system = world.enemy_system
+    world.coins = [coin for i, coin in enumerate(coins) if mask[i >> 3] & (1 << (i & 7))]
+    world.coin_grid = SpatialGrid(items=world.coins)
+    for i, (ex, ey, direction, alive) in enumerate(ENEMY.iter_unpack(body[offset:])):
+        system.x[i], system.y[i], system.direction[i], system.alive[i] = ex, ey, direction, alive
+    world.enemies = [enemy for enemy in system.bodies if system.alive[enemy.index]]
+
+    world.ticks = ticks
+    world.deaths = deaths
+    world.coin_count = coin_count
+    world.restart_timer = restart_timer
+    for name, bit in FLAGS:
+        setattr(world, name, bool(flags & bit))
+    world.player.center_x, world.player.center_y = x, y
+    world.dx, world.dy = dx, dy
+    world.interact_target = None
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SaveWriter:
+    """Пишет сохранения в фоновом потоке, по одному файлу за раз"""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # путь -> последние байты, которые еще не записаны
+        self.pending = {}
+        # Текст ошибки последней записи; None, если она удалась
+        self.error = None
+
+    def save(self, path, data):
+        with self.lock:
+            # Если прошлое сохранение в этот файл еще ждет, пишем только новое
+            queued = path in self.pending
+            self.pending[path] = data
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="savegame", daemon=True)
+                self.thread.start()
+        if not queued:
+            self.queue.put(path)
+
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            try:
+                with self.lock:
+                    data = self.pending.pop(path)
+                write_atomic(path, data)
+                self.error = None
+            except Exception as e:
+                # Поток должен пережить любую ошибку, иначе flush() не дождется
+                self.error = f"Не удалось сохранить {os.path.basename(path)}: {e}"
+            finally:
+                self.queue.task_done()
+
+    @property
+    def busy(self):
+        """Есть ли еще не записанные сохранения"""
+        return self.queue.unfinished_tasks > 0
+
+    def flush(self):
+        """Ждет, пока всё поставленное в очередь окажется на диске"""
+        self.queue.join()
+
+
+writer = SaveWriter()
+atexit.register(writer.flush)
+
+
+def save(world, path=SAVE_PATH):
+    writer.save(path, snapshot(world))
+
+
+def latest(paths=(SAVE_PATH, CHECKPOINT_PATH)):
+    """Самое свежее из существующих сохранений или None"""
+    writer.flush()
+    existing = [path for path in paths if os.path.isfile(path)]
+    if not existing:
+        return None
+    return max(existing, key=os.path.getmtime)
+
+
+def load(world, path):
+    with open(path, "rb") as f:
+        restore(world, f.read())
@@ -0,0 +1,472 @@
+"""
+Симуляция платформера без окна и OpenGL.
+
+World хранит состояние уровня и продвигается методом step() на один тик
+длиной SIMULATION_STEP. GameView только передает сюда ввод и рисует
+результат, поэтому логику уровней можно гонять и проверять без дисплея.
+
+Враги уровня живут в EnemySystem: координаты, скорости и границы патрулей
+лежат в массивах, и все враги сдвигаются одним шагом. Если врагов много
+и есть numpy, шаг и проверка касания игрока векторизованы; иначе те же
+массивы обходятся обычным циклом.
+"""
+import math
+from functools import lru_cache
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import levels
+from assetpack import open_asset
+from levels import LAST_LEVEL, LAVA_RESPAWN_LEVEL
+from profiler import NULL_PROFILER
+from spatial import SpatialGrid
+
+
+PLAYER_SPEED = 5
+PLAYER_JUMP = 15
+PLAYER_DOUBLE_JUMP = 8
+GRAVITY = 0.5
+
+INTERACT_DISTANCE = 150
+
+ENEMY_SPEED = 2.5
+ENEMY_BOUNCE_FORCE = 8
+
+SIMULATION_RATE = 60
+SIMULATION_STEP = 1 / SIMULATION_RATE
+
+# Через сколько тиков после гибели уровень перезапускается
+RESTART_DELAY = 30
+
+# С какого числа врагов их считает numpy: на паре врагов его вызовы
+# дороже простого цикла
+VECTORIZE_MIN_ENEMIES = 100
+
+
+@lru_cache(maxsize=None)
+def image_geometry(path, scale):
+    """
+    Хитбокс (смещения left, bottom, right, top от центра) и размер картинки
+    с учетом масштаба. Хитбокс - рамка непрозрачных пикселей.
+    """
+    from PIL import Image
+
+    with Image.open(open_asset(path)) as image:
+        width, height = image.size
+        if "A" in image.getbands():
+            bbox = image.getchannel("A").getbbox()
+        else:
+            bbox = None
+    x0, y0, x1, y1 = bbox or (0, 0, width, height)
+    box = ((x0 - width / 2) * scale, (height / 2 - y1) * scale,
+           (x1 - width / 2) * scale, (height / 2 - y0) * scale)
+    return box, (width * scale, height * scale)
+
+
+class Body:
+    """Прямоугольник с центром и хитбоксом, заданным смещениями от центра"""
+    __slots__ = ("center_x", "center_y", "box", "width", "height",
+                 "texture", "scale")
+
+    def __init__(self, texture, scale, center_x, center_y, box, size):
+        self.texture = texture
+        self.scale = scale
+        self.center_x = center_x
+        self.center_y = center_y
+        self.box = box
+        self.width, self.height = size
+
+    @classmethod
+    def from_record(cls, record):
+        _, texture, x, y, scale, box, size, _ = record
+        return cls(texture, scale, x, y, box, size)
+
+    @property
+    def position(self):
+        return self.center_x, self.center_y
+
+    @property
+    def left(self):
+        return self.center_x + self.box[0]
+
+    @property
+    def bottom(self):
+        return self.center_y + self.box[1]
+
+    @bottom.setter
+    def bottom(self, value):
+        self.center_y = value - self.box[1]
+
+    @property
+    def right(self):
+        return self.center_x + self.box[2]
+
+    @property
+    def top(self):
+        return self.center_y + self.box[3]
+
+    @top.setter
+    def top(self, value):
+        self.center_y = value - self.box[3]
+
+
+class Enemy(Body):
+    """Враг: координаты берутся из массивов EnemySystem по индексу"""
+    __slots__ = ("system", "index")
+
+    def __init__(self, system, index, texture, scale, box, size):
+        self.system = system
+        self.index = index
+        self.texture = texture
+        self.scale = scale
+        self.box = box
+        self.width, self.height = size
+
+    @property
+    def center_x(self):
+        return self.system.x[self.index]
+
+    @center_x.setter
+    def center_x(self, value):
+        self.system.x[self.index] = value
+
+    @property
+    def center_y(self):
+        return self.system.y[self.index]
+
+    @center_y.setter
+    def center_y(self, value):
+        self.system.y[self.index] = value
+
+
+class EnemySystem:
+    """
+    Все враги уровня в виде структуры массивов. bodies[i] - Enemy для
+    i-го врага, убитые остаются на своих местах с alive[i] = False.
+    """
+
+    def __init__(self, records, vectorized=None):
+        records = list(records)
+        if vectorized is None:
+            vectorized = numpy is not None and len(records) >= VECTORIZE_MIN_ENEMIES
+        self.vectorized = vectorized
+
+        columns = {name: [] for name in ("x", "y", "speed", "direction", "start", "end",
+                                         "left", "bottom", "right", "top", "height")}
+        self.bodies = []
+        for index, record in enumerate(records):
+            _, texture, x, y, scale, box, size, (start_x, end_x) = record
+            for name, value in (("x", x), ("y", y), ("speed", ENEMY_SPEED),
+                                ("direction", 1.0), ("start", start_x), ("end", end_x),
+                                ("left", box[0]), ("bottom", box[1]), ("right", box[2]),
+                                ("top", box[3]), ("height", size[1])):
+                columns[name].append(value)
+            self.bodies.append(Enemy(self, index, texture, scale, box, size))
+        alive = [True] * len(records)
+
+        if vectorized:
+            for name, values in columns.items():
+                setattr(self, name, numpy.array(values, dtype=float))
+            self.alive = numpy.array(alive, dtype=bool)
+        else:
+            for name, values in columns.items():
+                setattr(self, name, values)
+            self.alive = alive
+        # Начальные значения того, что меняется по ходу игры, для reset()
+        self.initial = {name: getattr(self, name).copy() for name in self.MUTABLE}
+
+    MUTABLE = ("x", "y", "direction", "alive")
+
+    def __len__(self):
+        return len(self.bodies)
+
+    def reset(self):
+        """Все враги снова живы и стоят в начале патрулей"""
+        for name, values in self.initial.items():
+            getattr(self, name)[:] = values
+
+    def step(self):
+        """Сдвигает всех врагов вдоль патрулей, разворачивая на концах"""
+        if self.vectorized:
+            # Убитые стоят на месте, как в цикле ниже: их x попадает в снимок
+            x, direction, alive = self.x, self.direction, self.alive
+            x[alive] += (self.speed * direction)[alive]
+            low = alive & (x <= self.start)
+            high = alive & ~low & (x >= self.end)
+            x[low] = self.start[low]
+            direction[low] = 1
+            x[high] = self.end[high]
+            direction[high] = -1
+            return
+        x, direction, start, end = self.x, self.direction, self.start, self.end
+        for i, speed in enumerate(self.speed):
+            if not self.alive[i]:
+                continue
+            xi = x[i] + speed * direction[i]
+            if xi <= start[i]:
+                xi = start[i]
+                direction[i] = 1
+            elif xi >= end[i]:
+                xi = end[i]
+                direction[i] = -1
+            x[i] = xi
+
+    def kill(self, enemy):
+        self.alive[enemy.index] = False
+
+    def _overlapping(self, left, bottom, right, top):
+        """Индексы живых врагов, чей AABB пересекается с прямоугольником"""
+        if self.vectorized:
+            x, y = self.x, self.y
+            mask = (self.alive & (right > x + self.left) & (left < x + self.right)
+                    & (top > y + self.bottom) & (bottom < y + self.top))
+            return numpy.flatnonzero(mask).tolist()
+        x, y, alive = self.x, self.y, self.alive
+        el, eb, er, et = self.left, self.bottom, self.right, self.top
+        return [i for i in range(len(x)) if alive[i] and
+                right > x[i] + el[i] and left < x[i] + er[i] and
+                top > y[i] + eb[i] and bottom < y[i] + et[i]]
+
+    def query(self, left, bottom, right, top):
+        return [self.bodies[i] for i in self._overlapping(left, bottom, right, top)]
+
+    def contacts(self, body):
+        """
+        Враги, которых касается body, и для каждого - выше ли центр body
+        трети высоты врага (условие прыжка сверху)
+        """
+        hit = self._overlapping(body.left, body.bottom, body.right, body.top)
+        if not hit:
+            return []
+        if self.vectorized:
+            above = (body.center_y > self.y[hit] + self.height[hit] / 3).tolist()
+        else:
+            above = [body.center_y > self.y[i] + self.height[i] / 3 for i in hit]
+        return [(self.bodies[i], a) for i, a in zip(hit, above)]
+
+
+class LevelTemplate:
+    """
+    Уровень в том виде, в каком он загружается: стены, лава, тайлы и их
+    сетки дальше не меняются, а монеты, враги и игрок восстанавливаются
+    из него при каждом перезапуске.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.walls = [Body.from_record(r) for r in compiled.of_kind(levels.WALL)]
+        self.lava = [Body.from_record(r) for r in compiled.of_kind(levels.LAVA)]
+        # тайлы только рисуются, а стены и лава без текстуры - невидимые
+        self.tiles = [Body.from_record(r) for r in compiled.of_kind(levels.TILE)]
+        self.wall_grid = SpatialGrid(items=self.walls)
+        self.lava_grid = SpatialGrid(items=self.lava)
+        # Монеты не двигаются, при перезапуске возвращаются те же тела
+        self.coins = [Body.from_record(r) for r in compiled.of_kind(levels.COIN)]
+        self.portal = Body.from_record(compiled.of_kind(levels.PORTAL)[0])
+        self.enemy_system = EnemySystem(compiled.of_kind(levels.ENEMY))
+        self.player = Body.from_record(compiled.of_kind(levels.PLAYER)[0])
+        self.player_start = self.player.position
+
+
+class World:
+    """
+    Состояние игры и один тик физики.
+
+    Всё, что должно дойти до игрока (звуки, сообщения, смена уровня),
+    складывается в self.events кортежами вида ("coin", body); GameView
+    забирает их после каждого тика.
+
+    Загруженные уровни остаются в self.templates. После гибели respawn()
+    не читает уровень заново, а только возвращает изменяемое состояние
+    (монеты, враги, портал, игрок) к шаблону и сообщает ("respawn", level).
+    """
+
+    def __init__(self, level=1, geometry=image_geometry, profiler=NULL_PROFILER):
+        self.geometry = geometry
+        self.profiler = profiler
+        self.ticks = 0
+        self.deaths = 0
+        self.completed = False
+        self.events = []
+        # номер уровня -> LevelTemplate
+        self.templates = {}
+        self.load_level(level)
+
+    def template_for(self, level):
+        template = self.templates.get(level)
+        if template is None:
+            template = LevelTemplate(levels.load_level(level, self.geometry))
+            self.templates[level] = template
+        return template
+
+    def enter(self, level):
+        """Переходит на уровень в начальном состоянии, без событий"""
+        template = self.template_for(level)
+        self.level = level
+        self.template = template
+        compiled = template.compiled
+        self.level_data = compiled
+
+        self.walls = template.walls
+        self.lava = template.lava
+        self.tiles = template.tiles
+        self.wall_grid = template.wall_grid
+        self.lava_grid = template.lava_grid
+        self.portal = template.portal
+        self.portal_active_texture = compiled.portal_active_texture
+        self.enemy_system = template.enemy_system
+        self.player = template.player
+        self.reset()
+
+    def reset(self):
+        """Возвращает изменяемое состояние уровня к шаблону"""
+        template = self.template
+        self.coins = list(template.coins)
+        self.coin_grid = SpatialGrid(items=self.coins)
+        self.enemy_system.reset()
+        # живые враги
+        self.enemies = list(self.enemy_system.bodies)
+
+        player = self.player
+        player.center_x, player.center_y = template.player_start
+        self.dx = self.dy = 0
+        self.on_ground = False
+        self.double_jumped = False
+        self.facing_right = True
+
+        self.coin_count = 0
+        self.coins_required = len(self.coins)
+        self.portal_active = False
+        self.interact_target = None
+        self.restart_timer = 0
+
+    def load_level(self, level):
+        self.enter(level)
+        self.events.append(("level", level))
+
+    def respawn(self, level):
+        """Перезапуск после гибели: тот же уровень или уровень из шаблона"""
+        if level == self.level:
+            self.reset()
+        else:
+            self.enter(level)
+        self.events.append(("respawn", level))
+
+    @property
+    def elapsed(self):
+        return self.ticks * SIMULATION_STEP
+
+    # Ввод
+    def press(self, action):
+        if action == "left":
+            self.dx = -PLAYER_SPEED
+            self.facing_right = False
+        elif action == "right":
+            self.dx = PLAYER_SPEED
+            self.facing_right = True
+        elif action == "jump":
+            if self.on_ground:
+                self.dy = PLAYER_JUMP
+                self.events.append(("jump",))
+            elif not self.double_jumped:
+                self.dy = PLAYER_DOUBLE_JUMP
+                self.double_jumped = True
+                self.events.append(("jump",))
+        elif action == "interact" and self.interact_target:
+            if self.portal_active:
+                if self.level < LAST_LEVEL:
+                    self.load_level(self.level + 1)
+                else:
+                    self.completed = True
+                    self.events.append(("completed",))
+            else:
+                missing = self.coins_required - self.coin_count
+                self.events.append(("need_coins", missing))
+
+    def release(self, action):
+        if action in ("left", "right"):
+            self.dx = 0
+
+    def hits(self, body, grid):
+        return grid.hits(body)
+
+    def step(self):
+        """Один тик длиной SIMULATION_STEP"""
+        self.ticks += 1
+        player = self.player
+        profiler = self.profiler
+
+        if self.restart_timer:
+            self.restart_timer -= 1
+            if not self.restart_timer:
+                self.respawn(self.level)
+                return
+
+        profiler.begin("portal")
+        self.interact_target = None
+        portal = self.portal
+        if math.hypot(portal.center_x - player.center_x,
+                      portal.center_y - player.center_y) <= INTERACT_DISTANCE:
+            self.interact_target = portal
+
+        profiler.begin("enemies")
+        self.enemy_system.step()
+
+        profiler.begin("collision_x")
+        self.dy -= GRAVITY
+
+        player.center_x += self.dx
+        if self.hits(player, self.wall_grid):
+            player.center_x -= self.dx
+
+        profiler.begin("collision_y")
+        player.center_y += self.dy
+        hy = self.hits(player, self.wall_grid)
+        if hy:
+            if self.dy > 0:
+                player.top = min(s.bottom for s in hy)
+            else:
+                player.bottom = max(s.top for s in hy)
+                self.on_ground = True
+                self.double_jumped = False
+            self.dy = 0
+        else:
+            self.on_ground = False
+
+        profiler.begin("enemy_contact")
+        for enemy, above in self.enemy_system.contacts(player):
+            # Проверяем, атакует ли игрок сверху
+            if self.dy < 0 and above:
+                self.enemies.remove(enemy)
+                self.enemy_system.kill(enemy)
+                # Отскок игрока вверх
+                self.dy = ENEMY_BOUNCE_FORCE
+                self.events.append(("enemy_killed", enemy))
+            else:
+                if not self.restart_timer:
+                    self.deaths += 1
+                    self.events.append(("death",))
+                # Пока игрок касается врага, перезапуск откладывается
+                self.restart_timer = RESTART_DELAY
+                profiler.end()
+                return
+
+        profiler.begin("coins")
+        for coin in self.hits(player, self.coin_grid):
+            self.coins.remove(coin)
+            self.coin_grid.remove(coin)
+            self.coin_count += 1
+            self.events.append(("coin", coin))
+
+        if not self.portal_active and self.coin_count >= self.coins_required:
+            self.portal_active = True
+            self.events.append(("portal",))
+
+        profiler.begin("lava")
+        if self.hits(player, self.lava_grid):
+            self.deaths += 1
+            self.respawn(LAVA_RESPAWN_LEVEL)
+        profiler.end()
@@ -0,0 +1,106 @@
+"""
+Равномерная сетка для широкой фазы коллизий.
+
+Объекты раскладываются по ячейкам CELL_SIZE x CELL_SIZE, запрос по
+прямоугольнику возвращает только объекты из ячеек, которые он задевает.
+Подходит для всего, у чего есть left/right/bottom/top.
+"""
+
+CELL_SIZE = 128
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=CELL_SIZE, items=()):
+        self.cell_size = cell_size
+        self.cells = {}
+        # id(объект) -> (объект, диапазон ячеек)
+        self.entries = {}
+        for item in items:
+            self.insert(item)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return (item for item, _ in self.entries.values())
+
+    def __contains__(self, item):
+        return id(item) in self.entries
+
+    def _cell_range(self, left, bottom, right, top):
+        size = self.cell_size
+        return (int(left // size), int(bottom // size),
+                int(right // size), int(top // size))
+
+    def _add_cells(self, item, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = bucket = {}
+                bucket[id(item)] = item
+
+    def _remove_cells(self, item, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.pop(id(item), None)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def insert(self, item):
+        if id(item) in self.entries:
+            self.move(item)
+            return
+        cell_range = self._cell_range(item.left, item.bottom, item.right, item.top)
+        self.entries[id(item)] = (item, cell_range)
+        self._add_cells(item, cell_range)
+
+    def remove(self, item):
+        entry = self.entries.pop(id(item), None)
+        if entry is not None:
+            self._remove_cells(item, entry[1])
+
+    def move(self, item):
+        """Обновляет ячейки объекта после перемещения"""
+        entry = self.entries.get(id(item))
+        if entry is None:
+            self.insert(item)
+            return
+        cell_range = self._cell_range(item.left, item.bottom, item.right, item.top)
+        if cell_range != entry[1]:
+            self._remove_cells(item, entry[1])
+            self._add_cells(item, cell_range)
+            self.entries[id(item)] = (item, cell_range)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
+    def query(self, left, bottom, right, top):
+        """Кандидаты, чьи ячейки пересекаются с прямоугольником"""
+        x0, y0, x1, y1 = self._cell_range(left, bottom, right, top)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            bucket = cells.get((x0, y0))
+            return list(bucket.values()) if bucket else []
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return list(found.values())
+
+    def hits(self, sprite):
+        """Объекты, чей AABB пересекается с AABB спрайта"""
+        left, right = sprite.left, sprite.right
+        bottom, top = sprite.bottom, sprite.top
+        return [s for s in self.query(left, bottom, right, top) if (
+            right > s.left and left < s.right and
+            top > s.bottom and bottom < s.top)]
@@ -0,0 +1,132 @@
+"""
+Подгрузка неподвижных частей уровня по чанкам.
+
+Уровень делится на квадраты CHUNK_SIZE x CHUNK_SIZE, тело попадает в
+чанк по своему центру. Спрайты создаются только для чанков рядом с
+камерой (видимая область плюс LOAD_MARGIN чанков) и выбрасываются, когда
+камера уходит дальше UNLOAD_MARGIN; зазор между ними не дает чанку
+мигать на границе. Рисуются только загруженные чанки, чьи спрайты
+задевают видимую область, поэтому и память, и время кадра зависят от
+того, что на экране, а не от размера уровня.
+"""
+import arcade
+
+
+CHUNK_SIZE = 512
+LOAD_MARGIN = 1
+UNLOAD_MARGIN = 2
+
+
+class Chunk:
+    def __init__(self, key, layers):
+        self.key = key
+        # слой -> тела, которые должны быть в этом чанке
+        self.bodies = {layer: [] for layer in layers}
+        # слой -> SpriteList, пока чанк загружен
+        self.lists = None
+        # Рамка всех спрайтов чанка, они могут вылезать за его квадрат
+        self.left = self.bottom = float("inf")
+        self.right = self.top = float("-inf")
+
+    def extend(self, body):
+        half_w, half_h = body.width / 2, body.height / 2
+        self.left = min(self.left, body.center_x - half_w)
+        self.bottom = min(self.bottom, body.center_y - half_h)
+        self.right = max(self.right, body.center_x + half_w)
+        self.top = max(self.top, body.center_y + half_h)
+
+
+class ChunkStreamer:
+    def __init__(self, layers, create_sprite, sprites, chunk_size=CHUNK_SIZE):
+        """
+        layers - имена слоев, create_sprite(body) - спрайт для тела,
+        sprites - общий словарь тело -> спрайт, в нем живут только
+        спрайты загруженных чанков
+        """
+        self.layers = layers
+        self.create_sprite = create_sprite
+        self.sprites = sprites
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self.loaded = {}
+        # Диапазон чанков, видимый при прошлом update
+        self.view = None
+
+    def key(self, x, y):
+        size = self.chunk_size
+        return int(x // size), int(y // size)
+
+    def add(self, layer, body):
+        key = self.key(body.center_x, body.center_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = Chunk(key, self.layers)
+        chunk.bodies[layer].append(body)
+        chunk.extend(body)
+        if chunk.lists is not None:
+            # Чанк уже на экране, например вернули подобранную монету
+            sprite = self.create_sprite(body)
+            sprite_list = chunk.lists.get(layer)
+            if sprite_list is None:
+                sprite_list = chunk.lists[layer] = arcade.SpriteList()
+            sprite_list.append(sprite)
+            self.sprites[body] = sprite
+
+    def remove(self, layer, body):
+        """Тело исчезло из уровня насовсем, например подобрали монету"""
+        chunk = self.chunks[self.key(body.center_x, body.center_y)]
+        chunk.bodies[layer].remove(body)
+        sprite = self.sprites.pop(body, None)
+        if sprite is not None:
+            sprite.remove_from_sprite_lists()
+
+    def _load(self, chunk):
+        chunk.lists = {}
+        for layer, bodies in chunk.bodies.items():
+            if not bodies:
+                # Пустой SpriteList тоже стоит буфера на видеокарте
+                continue
+            sprite_list = arcade.SpriteList()
+            for body in bodies:
+                sprite = self.create_sprite(body)
+                sprite_list.append(sprite)
+                self.sprites[body] = sprite
+            chunk.lists[layer] = sprite_list
+        self.loaded[chunk.key] = chunk
+
+    def _unload(self, chunk):
+        for bodies in chunk.bodies.values():
+            for body in bodies:
+                self.sprites.pop(body, None)
+        chunk.lists = None
+        del self.loaded[chunk.key]
+
+    def update(self, left, bottom, right, top):
+        """Подгружает чанки у видимой области и выгружает дальние"""
+        x0, y0 = self.key(left, bottom)
+        x1, y1 = self.key(right, top)
+        view = (x0, y0, x1, y1)
+        if view == self.view:
+            return
+        self.view = view
+
+        for key, chunk in list(self.loaded.items()):
+            cx, cy = key
+            if (cx < x0 - UNLOAD_MARGIN or cx > x1 + UNLOAD_MARGIN or
+                    cy < y0 - UNLOAD_MARGIN or cy > y1 + UNLOAD_MARGIN):
+                self._unload(chunk)
+
+        chunks = self.chunks
+        for cx in range(x0 - LOAD_MARGIN, x1 + LOAD_MARGIN + 1):
+            for cy in range(y0 - LOAD_MARGIN, y1 + LOAD_MARGIN + 1):
+                chunk = chunks.get((cx, cy))
+                if chunk is not None and chunk.lists is None:
+                    self._load(chunk)
+
+    def draw(self, layer, left, bottom, right, top):
+        for chunk in self.loaded.values():
+            if (chunk.right > left and chunk.left < right and
+                    chunk.top > bottom and chunk.bottom < top):
+                sprite_list = chunk.lists.get(layer)
+                if sprite_list is not None:
+                    sprite_list.draw()
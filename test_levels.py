@@ -0,0 +1,57 @@
+"""
+Проверки загрузки уровней: python -m pytest -q
+
+Окно arcade создается безголовым, как в bench.py.
+"""
+import functools
+import json
+import os
+
+os.environ.setdefault("ARCADE_HEADLESS", "1")
+
+import pytest
+
+import levels
+
+
+@pytest.fixture
+def level_without_coins(tmp_path, monkeypatch):
+    """Копия level1 без "coins" под номером 99 во временной папке maps"""
+    with open(levels.level_path(1), encoding="utf-8") as f:
+        spec = json.load(f)
+    del spec["coins"]
+    maps = tmp_path / "maps"
+    maps.mkdir()
+    (maps / "level99.json").write_text(json.dumps(spec), encoding="utf-8")
+    monkeypatch.setattr(levels, "MAPS_DIR", str(maps))
+    monkeypatch.setattr(levels, "CACHE_DIR", str(tmp_path / "cache"))
+    return 99
+
+
+def test_world_without_coins(level_without_coins):
+    from simulation import World
+
+    world = World(level_without_coins)
+    assert world.level_data.coin_texture is None
+    assert world.coins == []
+    world.step()
+    # Собирать нечего, портал открыт сразу
+    assert world.portal_active
+
+
+def test_game_view_without_coins(level_without_coins, monkeypatch):
+    import arcade
+    import game2
+    from simulation import SIMULATION_STEP, World
+
+    window = arcade.Window(game2.WINDOW_WIDTH, game2.WINDOW_HEIGHT, visible=False)
+    try:
+        monkeypatch.setattr(game2, "World", functools.partial(World, level_without_coins))
+        view = game2.GameView()
+        window.show_view(view)
+        assert view.bone_icon_sprite is None
+        assert not view.hud.labels["coins"][0].visible
+        view.on_update(SIMULATION_STEP)
+        view.on_draw()
+    finally:
+        window.close()
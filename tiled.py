@@ -0,0 +1,425 @@
+"""
+Импорт карт Tiled (.tmx и JSON: .tmj или .json) в описание уровня.
+
+Тайловые слои рисуются как есть: каждый тайл становится записью в
+spec["tiles"], она только рисуется и ни с чем не сталкивается.
+Столкновения берутся отдельно из слоев со свойством collision (стены)
+или lava (лава): занятые клетки всех таких слоев жадно сливаются в
+прямоугольники (greedy meshing) и попадают в spec["colliders"] как
+невидимые тела. Платформа из сотни тайлов - это один прямоугольник в
+World.hits, а не сотня. Невидимый слой со свойством collision дает
+коллизии без картинки.
+
+Объекты ищутся по классу (type у старых версий Tiled):
+    player   старт игрока
+    coin     монета, тайл-объект
+    portal   портал, тайл-объект, свойство active_texture
+    enemy    враг, тайл-объект, свойство patrol - длина патруля вправо
+
+Свойства карты: background - фон, scale - во сколько раз пиксель Tiled
+больше пикселя мира (по умолчанию 1).
+
+Поддерживаются ортогональные карты, в том числе бесконечные, и наборы
+тайлов из отдельных картинок ("Collection of Images"), встроенные или во
+внешних .tsx/.tsj. Отражения тайлов и смещения слоев не учитываются.
+
+    python tiled.py map.tmx    # сколько тайлов и коллайдеров получится
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+import zlib
+
+from assetpack import ASSET_DIR
+
+# Старшие биты gid - флаги отражения и поворота
+GID_MASK = 0x0FFFFFFF
+
+COLLISION_PROPERTY = "collision"
+LAVA_PROPERTY = "lava"
+
+
+# Разбор файлов
+def _xml_properties(element):
+    properties = []
+    node = element.find("properties")
+    if node is None:
+        return properties
+    for prop in node.findall("property"):
+        kind = prop.get("type", "string")
+        value = prop.get("value")
+        if value is None:
+            value = prop.text or ""
+        if kind == "bool":
+            value = value == "true"
+        elif kind == "int":
+            value = int(value)
+        elif kind == "float":
+            value = float(value)
+        properties.append({"name": prop.get("name"), "type": kind, "value": value})
+    return properties
+
+
+def _xml_data(node, encoding):
+    """Содержимое <data> или <chunk>: список gid или строка base64"""
+    if encoding == "csv":
+        return [int(v) for v in node.text.replace("\n", "").split(",") if v.strip()]
+    if encoding == "base64":
+        return node.text.strip()
+    if encoding is None:
+        return [int(tile.get("gid", 0)) for tile in node.findall("tile")]
+    raise ValueError(f"Неизвестная кодировка слоя: {encoding}")
+
+
+def _xml_tileset(node):
+    tileset = {"tiles": []}
+    for key in ("name", "tilewidth", "tileheight"):
+        if node.get(key) is not None:
+            tileset[key] = node.get(key)
+    if node.find("image") is not None:
+        tileset["image"] = node.find("image").get("source")
+    for tile in node.findall("tile"):
+        entry = {"id": int(tile.get("id")), "properties": _xml_properties(tile)}
+        image = tile.find("image")
+        if image is not None:
+            entry["image"] = image.get("source")
+            entry["imagewidth"] = int(image.get("width"))
+            entry["imageheight"] = int(image.get("height"))
+        tileset["tiles"].append(entry)
+    return tileset
+
+
+def _xml_layers(parent):
+    layers = []
+    for node in parent:
+        common = {"name": node.get("name", ""), "visible": node.get("visible", "1") != "0",
+                  "properties": _xml_properties(node)}
+        if node.tag == "layer":
+            width, height = int(node.get("width")), int(node.get("height"))
+            layer = dict(common, type="tilelayer", width=width, height=height)
+            data = node.find("data")
+            encoding = data.get("encoding")
+            if encoding == "base64":
+                layer["encoding"] = encoding
+                layer["compression"] = data.get("compression", "")
+            chunks = data.findall("chunk")
+            if chunks:
+                layer["chunks"] = []
+                for chunk in chunks:
+                    w, h = int(chunk.get("width")), int(chunk.get("height"))
+                    layer["chunks"].append({
+                        "x": int(chunk.get("x")), "y": int(chunk.get("y")),
+                        "width": w, "height": h, "data": _xml_data(chunk, encoding)})
+            else:
+                layer["data"] = _xml_data(data, encoding)
+            layers.append(layer)
+        elif node.tag == "objectgroup":
+            objects = []
+            for obj in node.findall("object"):
+                entry = {"name": obj.get("name", ""),
+                         "type": obj.get("class") or obj.get("type") or "",
+                         "x": float(obj.get("x", 0)), "y": float(obj.get("y", 0)),
+                         "width": float(obj.get("width", 0)),
+                         "height": float(obj.get("height", 0)),
+                         "properties": _xml_properties(obj)}
+                if obj.get("gid"):
+                    entry["gid"] = int(obj.get("gid"))
+                if obj.find("point") is not None:
+                    entry["point"] = True
+                objects.append(entry)
+            layers.append(dict(common, type="objectgroup", objects=objects))
+        elif node.tag == "group":
+            layers.append(dict(common, type="group", layers=_xml_layers(node)))
+    return layers
+
+
+def _read_tmx(path):
+    """TMX приводится к тому же виду, что и JSON-карта Tiled"""
+    root = ET.parse(path).getroot()
+    tiled_map = {key: root.get(key) for key in ("orientation",)}
+    for key in ("width", "height", "tilewidth", "tileheight"):
+        tiled_map[key] = int(root.get(key))
+    tiled_map["infinite"] = root.get("infinite") == "1"
+    tiled_map["properties"] = _xml_properties(root)
+    tiled_map["tilesets"] = []
+    for node in root.findall("tileset"):
+        tileset = {"firstgid": int(node.get("firstgid"))}
+        if node.get("source"):
+            tileset["source"] = node.get("source")
+        else:
+            tileset.update(_xml_tileset(node))
+        tiled_map["tilesets"].append(tileset)
+    tiled_map["layers"] = _xml_layers(root)
+    return tiled_map
+
+
+def _read_tileset(path):
+    if path.endswith(".tsx"):
+        return _xml_tileset(ET.parse(path).getroot())
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _decode_data(layer, data, count):
+    """Данные слоя или его куска -> список gid"""
+    if isinstance(data, list):
+        return data
+    raw = base64.b64decode(data)
+    compression = layer.get("compression") or ""
+    if compression == "zlib":
+        raw = zlib.decompress(raw)
+    elif compression == "gzip":
+        raw = gzip.decompress(raw)
+    elif compression:
+        raise ValueError(f"Сжатие {compression} не поддерживается")
+    if len(raw) != count * 4:
+        raise ValueError("Размер данных слоя не совпадает с его размером")
+    return struct.unpack(f"<{count}I", raw)
+
+
+def is_tiled_map(data):
+    """Похож ли разобранный JSON на карту Tiled, а не на описание уровня"""
+    return data.get("type") == "map" or "tiledversion" in data
+
+
+# Слияние клеток
+def merge_cells(cells):
+    """
+    Жадно покрывает множество клеток (столбец, строка) прямоугольниками:
+    берет самую верхнюю левую свободную клетку, тянет полосу вправо,
+    пока клетки заняты, потом вниз, пока вся полоса занята. Возвращает
+    (столбец, строка, ширина, высота) в клетках.
+    """
+    cells = set(cells)
+    rects = []
+    for col, row in sorted(cells, key=lambda cell: (cell[1], cell[0])):
+        if (col, row) not in cells:
+            continue
+        width = 1
+        while (col + width, row) in cells:
+            width += 1
+        span = range(col, col + width)
+        height = 1
+        while all((c, row + height) in cells for c in span):
+            height += 1
+        for r in range(row, row + height):
+            for c in span:
+                cells.discard((c, r))
+        rects.append((col, row, width, height))
+    return rects
+
+
+# Перевод в описание уровня
+class TiledMap:
+    def __init__(self, path):
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        if path.endswith(".tmx"):
+            data = _read_tmx(path)
+        else:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        if data.get("orientation", "orthogonal") != "orthogonal":
+            raise ValueError(f"{path}: поддерживаются только ортогональные карты")
+        self.data = data
+        # Файлы, от которых зависит уровень: сама карта и внешние наборы
+        self.sources = [path]
+        self.tile_width = data["tilewidth"]
+        self.tile_height = data["tileheight"]
+        self.height = data["height"] * self.tile_height
+        self.properties = self._properties(data, self.base_dir)
+        self.scale = float(self.properties.get("scale", 1.0))
+        # gid -> (текстура, ширина, высота, свойства)
+        self.tiles = {}
+        for tileset in data.get("tilesets", []):
+            self._add_tileset(tileset)
+
+    def _asset(self, source, base_dir):
+        """Путь картинки из Tiled -> имя ресурса относительно ASSET_DIR"""
+        path = os.path.normpath(os.path.join(base_dir, source))
+        return os.path.relpath(path, ASSET_DIR).replace(os.sep, "/")
+
+    def _properties(self, item, base_dir):
+        properties = {}
+        for prop in item.get("properties", []):
+            value = prop["value"]
+            if prop.get("type") == "file" and value:
+                value = self._asset(value, base_dir)
+            properties[prop["name"]] = value
+        return properties
+
+    def _add_tileset(self, tileset):
+        base_dir = self.base_dir
+        if "source" in tileset:
+            path = os.path.join(base_dir, tileset["source"])
+            self.sources.append(path)
+            tileset = dict(_read_tileset(path), firstgid=tileset["firstgid"])
+            base_dir = os.path.dirname(os.path.abspath(path))
+        if tileset.get("image"):
+            raise ValueError(f"{self.path}: набор {tileset.get('name')} - одна картинка на все "
+                             f"тайлы, нужен набор из отдельных картинок")
+        first = tileset["firstgid"]
+        for tile in tileset.get("tiles", []):
+            if "image" not in tile:
+                continue
+            self.tiles[first + tile["id"]] = (
+                self._asset(tile["image"], base_dir), tile["imagewidth"],
+                tile["imageheight"], self._properties(tile, base_dir))
+
+    def _tile(self, gid):
+        tile = self.tiles.get(gid & GID_MASK)
+        if tile is None:
+            raise ValueError(f"{self.path}: тайл {gid & GID_MASK} без картинки")
+        return tile
+
+    def _layers(self, layers=None, visible=True):
+        """Все слои с учетом групп: (слой, видим ли он)"""
+        for layer in self.data["layers"] if layers is None else layers:
+            shown = visible and layer.get("visible", True)
+            if layer["type"] == "group":
+                yield from self._layers(layer["layers"], shown)
+            else:
+                yield layer, shown
+
+    def _cells(self, layer):
+        """(столбец, строка, gid) всех непустых клеток слоя"""
+        if "chunks" in layer:
+            parts = layer["chunks"]
+        else:
+            parts = [dict(layer, x=0, y=0)]
+        for part in parts:
+            width, x0, y0 = part["width"], part["x"], part["y"]
+            gids = _decode_data(layer, part["data"], width * part["height"])
+            for i, gid in enumerate(gids):
+                if gid:
+                    row, col = divmod(i, width)
+                    yield x0 + col, y0 + row, gid
+
+    def world(self, x, y):
+        """Точка Tiled (ось y вниз) -> точка мира (ось y вверх)"""
+        return x * self.scale, (self.height - y) * self.scale
+
+    def spec(self):
+        scale = self.scale
+        tiles = []
+        solid = {"walls": set(), "lava": set()}
+        for layer, visible in self._layers():
+            if layer["type"] != "tilelayer":
+                continue
+            properties = self._properties(layer, self.base_dir)
+            target = None
+            if properties.get(COLLISION_PROPERTY):
+                target = solid["walls"]
+            elif properties.get(LAVA_PROPERTY):
+                target = solid["lava"]
+            for col, row, gid in self._cells(layer):
+                if target is not None:
+                    target.add((col, row))
+                if not visible:
+                    continue
+                texture, width, height, _ = self._tile(gid)
+                # Картинка тайла стоит левым нижним углом в углу клетки
+                left, bottom = self.world(col * self.tile_width, (row + 1) * self.tile_height)
+                tiles.append({"texture": texture, "scale": scale,
+                              "x": left + width * scale / 2,
+                              "y": bottom + height * scale / 2})
+
+        colliders = {}
+        for kind, cells in solid.items():
+            rects = []
+            for col, row, width, height in merge_cells(cells):
+                left, top = self.world(col * self.tile_width, row * self.tile_height)
+                rects.append([left, top - height * self.tile_height * scale,
+                              left + width * self.tile_width * scale, top])
+            colliders[kind] = rects
+
+        spec = {"background": self.properties.get("background"), "walls": [],
+                "tiles": tiles, "colliders": colliders}
+        self._objects(spec)
+        return spec
+
+    def _objects(self, spec):
+        coins = []
+        patrols = []
+        enemy_look = None
+        coin_look = None
+        for layer, _ in self._layers():
+            if layer["type"] != "objectgroup":
+                continue
+            for obj in layer["objects"]:
+                kind = obj.get("type") or obj.get("class") or ""
+                if kind not in ("player", "coin", "portal", "enemy"):
+                    continue
+                properties = self._properties(obj, self.base_dir)
+                if "gid" in obj:
+                    texture, image_width, _, _ = self._tile(obj["gid"])
+                    # Тайл-объект привязан левым нижним углом
+                    x = obj["x"] + obj["width"] / 2
+                    y = obj["y"] - obj["height"] / 2
+                    look = (texture, self.scale * (obj["width"] or image_width) / image_width)
+                else:
+                    x = obj["x"] + obj.get("width", 0) / 2
+                    y = obj["y"] + obj.get("height", 0) / 2
+                    look = None
+                position = self.world(x, y)
+
+                if kind == "player":
+                    spec["player_start"] = list(position)
+                    continue
+                if look is None:
+                    raise ValueError(f"{self.path}: {kind} должен быть тайл-объектом")
+                if kind == "coin":
+                    if coin_look not in (None, look):
+                        raise ValueError(f"{self.path}: у монет должна быть одна картинка")
+                    coin_look = look
+                    coins.append(list(position))
+                elif kind == "portal":
+                    if "portal" in spec:
+                        raise ValueError(f"{self.path}: портал может быть только один")
+                    spec["portal"] = {"texture": look[0], "scale": look[1],
+                                      "x": position[0], "y": position[1],
+                                      "active_texture": properties.get("active_texture", look[0])}
+                elif kind == "enemy":
+                    if enemy_look not in (None, look):
+                        raise ValueError(f"{self.path}: у врагов должна быть одна картинка")
+                    enemy_look = look
+                    patrol = float(properties.get("patrol", 0)) * self.scale
+                    patrols.append([position[0], position[0] + patrol, position[1]])
+
+        for key in ("player_start", "portal"):
+            if key not in spec:
+                raise ValueError(f"{self.path}: на карте нет объекта {key.split('_')[0]}")
+        if coins:
+            spec["coins"] = {"texture": coin_look[0], "scale": coin_look[1],
+                             "positions": coins}
+        if patrols:
+            spec["enemies"] = {"texture": enemy_look[0], "scale": enemy_look[1],
+                               "patrols": patrols}
+
+
+def load_map(path):
+    """Карта Tiled -> (описание уровня, файлы, из которых оно собрано)"""
+    tiled_map = TiledMap(path)
+    return tiled_map.spec(), tiled_map.sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка карты Tiled")
+    parser.add_argument("path", help="файл .tmx, .tmj или .json")
+    args = parser.parse_args(argv)
+
+    spec, _ = load_map(args.path)
+    colliders = spec["colliders"]
+    print(f"тайлов {len(spec['tiles'])}, коллайдеров стен {len(colliders['walls'])}, "
+          f"лавы {len(colliders['lava'])}, монет {len(spec.get('coins', {}).get('positions', []))}, "
+          f"врагов {len(spec.get('enemies', {}).get('patrols', []))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Общие виджеты для меню всех игр.
+
+Panel держит кнопки и надписи одного экрана. Прямоугольники кнопок -
+pyglet.shapes, надписи - arcade.Text, всё в одном batch, поэтому экран
+рисуется одним draw(), а геометрия собирается один раз. При наведении
+перекрашиваются только кнопки, у которых поменялось состояние. Кнопка
+под курсором ищется через SpatialGrid, а клик вызывает ее on_click.
+"""
+import arcade
+import pyglet
+from pyglet import shapes
+
+from spatial import SpatialGrid
+
+
+HOVER_LIGHTEN = 50
+BORDER_WIDTH = 3
+BORDER_COLOR = arcade.color.WHITE
+HOVER_BORDER_COLOR = arcade.color.YELLOW
+LABEL_COLOR = arcade.color.WHITE
+LABEL_SIZE = 16
+
+
+def lighten(color, amount=HOVER_LIGHTEN):
+    return tuple(min(255, c + amount) for c in color[:3])
+
+
+class Button:
+    def __init__(self, text, x, y, width, height, color, on_click=None):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.color = color
+        self.on_click = on_click
+        self.is_hovered = False
+        # Создаются в Panel.add_button
+        self.rect = None
+        self.label = None
+
+    @property
+    def left(self):
+        return self.x - self.width/2
+
+    @property
+    def right(self):
+        return self.x + self.width/2
+
+    @property
+    def bottom(self):
+        return self.y - self.height/2
+
+    @property
+    def top(self):
+        return self.y + self.height/2
+
+    def contains_point(self, x, y):
+        return (self.left <= x <= self.right and
+                self.bottom <= y <= self.top)
+
+    def set_hovered(self, hovered):
+        if hovered == self.is_hovered:
+            return
+        self.is_hovered = hovered
+        if hovered:
+            self.rect.color = lighten(self.color)
+            self.rect.border_color = HOVER_BORDER_COLOR
+        else:
+            self.rect.color = self.color[:3]
+            self.rect.border_color = BORDER_COLOR
+
+    def click(self):
+        if self.on_click:
+            self.on_click()
+
+
+class Panel:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        # Порядок слоев: подложки, кнопки, надписи
+        self.back_group = pyglet.graphics.Group(order=0)
+        self.button_group = pyglet.graphics.Group(order=1)
+        self.text_group = pyglet.graphics.Group(order=2)
+        self.buttons = []
+        self.grid = SpatialGrid()
+        self.hovered = None
+        # Ссылки на фигуры и надписи, иначе они пропадут из batch
+        self.shapes = []
+        self.labels = []
+
+    def add_button(self, text, x, y, width, height, color, on_click=None):
+        button = Button(text, x, y, width, height, color, on_click)
+        # Рамка толщиной BORDER_WIDTH лежит по краю кнопки, как раньше линии
+        half = BORDER_WIDTH / 2
+        button.rect = shapes.BorderedRectangle(
+            button.left - half, button.bottom - half,
+            width + BORDER_WIDTH, height + BORDER_WIDTH,
+            border=BORDER_WIDTH, color=color[:3], border_color=BORDER_COLOR,
+            batch=self.batch, group=self.button_group)
+        button.label = arcade.Text(text, x, y, LABEL_COLOR, LABEL_SIZE,
+                                   anchor_x="center", anchor_y="center",
+                                   batch=self.batch, group=self.text_group)
+        self.buttons.append(button)
+        self.grid.insert(button)
+        return button
+
+    def add_label(self, text, x, y, color, font_size, **kwargs):
+        label = arcade.Text(text, x, y, color, font_size,
+                            batch=self.batch, group=self.text_group, **kwargs)
+        self.labels.append(label)
+        return label
+
+    def add_rectangle(self, x, y, width, height, color):
+        """Заливка под кнопками, например затемнение экрана паузы"""
+        rect = shapes.Rectangle(x, y, width, height, color=color,
+                                batch=self.batch, group=self.back_group)
+        self.shapes.append(rect)
+        return rect
+
+    def button_at(self, x, y):
+        for button in self.grid.query(x, y, x, y):
+            if button.contains_point(x, y):
+                return button
+        return None
+
+    def on_mouse_motion(self, x, y):
+        button = self.button_at(x, y)
+        if button is self.hovered:
+            return
+        if self.hovered:
+            self.hovered.set_hovered(False)
+        if button:
+            button.set_hovered(True)
+        self.hovered = button
+
+    def on_mouse_press(self, x, y):
+        button = self.button_at(x, y)
+        if button:
+            button.click()
+        return button
+
+    def draw(self):
+        self.batch.draw()